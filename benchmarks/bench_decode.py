@@ -0,0 +1,60 @@
+"""对比标准库 json 与 orjson 解析和风天气响应的耗时
+
+    python benchmarks/bench_decode.py [--number 2000]
+
+结果以 json 输出到标准输出。
+"""
+import argparse
+import importlib.util
+import json
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAYLOADS = Path(__file__).resolve().parent / "payloads"
+
+
+def load_decoder():
+    # 直接按路径加载，不需要安装 Home Assistant
+    spec = importlib.util.spec_from_file_location(
+        "qweather_decoder", ROOT / "custom_components/qweather/decoder.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(func, body: bytes, number: int) -> float:
+    """单次解析的平均耗时（微秒）"""
+    return min(timeit.repeat(lambda: func(body), number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    decoder = load_decoder()
+    results = []
+    for path in sorted(PAYLOADS.glob("*.json")):
+        body = path.read_bytes()
+        result = {
+            "payload": path.name,
+            "bytes": len(body),
+            "json_us": bench(json.loads, body, args.number),
+            "decoder_us": bench(decoder.loads, body, args.number),
+            "executor": len(body) >= decoder.EXECUTOR_THRESHOLD,
+        }
+        result["speedup"] = result["json_us"] / result["decoder_us"]
+        results.append(result)
+
+    json.dump(
+        {"benchmark": "decode", "backend": decoder.backend(), "results": results},
+        sys.stdout,
+        indent=2,
+    )
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
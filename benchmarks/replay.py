@@ -0,0 +1,350 @@
+"""回放录制的和风天气请求，评估大量位置时的资源占用
+
+    python benchmarks/replay.py --log qweather.<entry_id>.traffic.jsonl.gz --locations 1000 --speed 600
+    python benchmarks/replay.py --synthetic-hours 6 --locations 1000 --speed 0
+
+日志由选项中的 record_traffic 录制（位于 .storage 目录），也可以由 payloads 合成。
+完全离线：hub 的 http session 被替换为按日志返回响应的替身，每个模拟位置对应日志中的
+一个位置，按日志中的时间顺序刷新 hub，数据经 QWeatherData 到达天气实体并写入状态机。
+speed 为回放的加速倍数，0 表示不等待。需要安装 Home Assistant，结果以 json 输出。
+"""
+import argparse
+import asyncio
+import copy
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "custom_components"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aiohttp import (ClientConnectionError, ClientResponseError,  # noqa: E402
+                     RequestInfo)
+from multidict import CIMultiDict, CIMultiDictProxy  # noqa: E402
+from yarl import URL  # noqa: E402
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from qweather.const import CONF_LOCATION  # noqa: E402
+from qweather.decoder import backend  # noqa: E402
+from qweather.hub import QWeatherFleet, QWeatherHub  # noqa: E402
+from qweather.recorder import read_records  # noqa: E402
+from qweather.session import DATA_SESSION, QWeatherSession  # noqa: E402
+from qweather.weather import QWeather  # noqa: E402
+from run import (PAYLOADS, WEATHER_FEATURES, async_create_hass,  # noqa: E402
+                 fleet_config, latency_summary)
+
+# 模拟位置的 ID 从这里开始编号，避免与日志中的位置混淆
+SYNTHETIC_LOCATION = 200000000
+# 事件循环延迟的采样间隔（秒）
+LAG_INTERVAL = 0.05
+
+# 合成日志时各项数据的刷新间隔与 payloads 中的文件
+SYNTHETIC_FEATURES = {
+    "now": ("weather/now", "now.json", timedelta(minutes=10)),
+    "hourly": ("weather/24h", "24h.json", timedelta(minutes=15)),
+    "daily": ("weather/7d", "7d.json", timedelta(hours=3)),
+}
+
+
+def request_target(url: str) -> tuple[str, str]:
+    """请求地址中的接口路径和位置，忽略 key 和主机"""
+    parsed = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qs(parsed.query)
+    return "/".join(parsed.path.split("/")[-2:]), query.get("location", [""])[0]
+
+
+def synthesize(hours: float, templates: int, seed: int = 0) -> list[dict[str, Any]]:
+    """由 payloads 合成日志，每次发布的 updateTime 和温度都有变化"""
+    rng = random.Random(seed)
+    start = datetime(2024, 6, 1, tzinfo=timezone(timedelta(hours=8)))
+    records = []
+    for feature, (path, file, interval) in SYNTHETIC_FEATURES.items():
+        payload = json.loads((PAYLOADS / file).read_bytes())
+        for template in range(templates):
+            location = str(101000000 + template)
+            at = start + interval * rng.random()
+            while at < start + timedelta(hours=hours):
+                body = copy.deepcopy(payload)
+                body["updateTime"] = at.isoformat(timespec="minutes")
+                items = body.get("hourly") or body.get("daily") or [body["now"]]
+                for item in items:
+                    for field in ("temp", "tempMax", "tempMin"):
+                        if field in item:
+                            item[field] = str(int(item[field]) + rng.randint(-1, 1))
+                records.append({
+                    "t": at.timestamp(),
+                    "feature": feature,
+                    "url": f"https://devapi.qweather.com/v7/{path}?location={location}",
+                    "latency": round(rng.uniform(0.05, 0.3), 4),
+                    "body": body,
+                })
+                at += interval
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+class ReplayResponse:
+    def __init__(self, record: dict[str, Any], latency: bool) -> None:
+        self.status = 200
+        self.headers: dict[str, str] = {}
+        self._record = record
+        self._latency = latency
+
+    async def __aenter__(self) -> "ReplayResponse":
+        if self._latency:
+            await asyncio.sleep(self._record["latency"])
+        if "error" in self._record:
+            raise ClientConnectionError(self._record["error"])
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise ClientResponseError(
+                RequestInfo(
+                    URL(self._record["url"]), "GET", CIMultiDictProxy(CIMultiDict())),
+                (),
+                status=self.status,
+                headers=self.headers,
+            )
+
+    async def read(self) -> bytes:
+        return self._record["body_bytes"]
+
+
+class ReplaySession:
+    """替身 http session，按模拟位置对应的日志位置返回最近一次录制的响应"""
+
+    def __init__(self, mapping: dict[str, str], latency: bool) -> None:
+        self.mapping = mapping
+        self.latency = latency
+        self.current: dict[tuple[str, str], dict[str, Any]] = {}
+        self.requests = 0
+        self.misses = 0
+
+    def get(self, url: str, headers: dict[str, str] | None = None) -> ReplayResponse:
+        self.requests += 1
+        path, location = request_target(url)
+        record = self.current.get((path, self.mapping.get(location, location)))
+        if record is None:
+            self.misses += 1
+            record = {"error": "NoRecordedResponse", "latency": 0}
+        return ReplayResponse(record, self.latency)
+
+
+class ReplaySessionPool(QWeatherSession):
+    """代替集成共享的连接池，所有 hub 都使用同一个替身 session"""
+
+    def __init__(self, session: ReplaySession) -> None:
+        super().__init__()
+        self._replay = session
+
+    def acquire(self) -> ReplaySession:
+        return self._replay
+
+    async def release(self) -> None:
+        pass
+
+
+async def async_measure_lag(samples: list[float], stop: asyncio.Event) -> None:
+    """事件循环延迟：定时器实际唤醒时间与预期的差"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def attach_entity(hass: HomeAssistant, hub: QWeatherHub, i: int) -> dict[str, int]:
+    """为 hub 创建天气实体，状态写入状态机，预报经订阅转换"""
+    counters = {"writes": 0, "forecasts": 0}
+    entity = QWeather(hub)
+    entity.hass = hass
+    entity.entity_id = f"weather.replay_{i}"
+
+    def write_state() -> None:
+        counters["writes"] += 1
+        hass.states.async_set(entity.entity_id, entity.state, entity.state_attributes)
+
+    def on_forecast(forecast: Any) -> None:
+        counters["forecasts"] += 1
+
+    entity.async_write_ha_state = write_state
+    for forecast_type in ("hourly", "twice_daily"):
+        entity.async_subscribe_forecast(forecast_type, on_forecast)
+    hass.async_create_task(entity.async_added_to_hass())
+    return counters
+
+
+async def async_replay(
+    hass: HomeAssistant, records: list[dict[str, Any]], args: argparse.Namespace
+) -> dict[str, Any]:
+    records = [
+        record for record in records
+        if record["feature"] in WEATHER_FEATURES and "," not in request_target(record["url"])[1]
+    ]
+    templates = sorted({request_target(record["url"])[1] for record in records})
+    if not templates:
+        raise SystemExit("No replayable records")
+    for record in records:
+        if record.get("body") is not None:
+            record["body_bytes"] = json.dumps(record["body"], ensure_ascii=False).encode()
+
+    fleet_locations = [str(SYNTHETIC_LOCATION + i) for i in range(args.locations)]
+    mapping = {
+        location: templates[i % len(templates)] for i, location in enumerate(fleet_locations)
+    }
+    hubs_by_template: dict[str, list[QWeatherHub]] = {}
+    session = ReplaySession(mapping, not args.no_latency)
+    hass.data[DATA_SESSION] = ReplaySessionPool(session)
+
+    # 预热：建立 hub 和实体并送入每项数据的第一条记录，期间统计内存
+    first: dict[tuple[str, str], dict[str, Any]] = {}
+    for record in records:
+        first.setdefault((record["feature"], request_target(record["url"])[1]), record)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    config = fleet_config(args.locations)
+    config[CONF_LOCATION] = ",".join(fleet_locations)
+    fleet = QWeatherFleet(hass, f"replay_{args.locations}", config)
+    await fleet.asnyc_setup()
+    counters = []
+    for i, hub in enumerate(fleet.hubs):
+        hubs_by_template.setdefault(mapping[hub.location], []).append(hub)
+        counters.append(attach_entity(hass, hub, i))
+    await hass.async_block_till_done()
+
+    for (feature, template), record in first.items():
+        session.current[(request_target(record["url"])[0], template)] = record
+        await asyncio.gather(
+            *(hub.async_refresh(feature) for hub in hubs_by_template[template]))
+    await hass.async_block_till_done()
+
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    # 按日志的时间顺序回放，统计 CPU 时间和事件循环延迟
+    warmup = {id(record) for record in first.values()}
+    timeline = [record for record in records if id(record) not in warmup]
+    lag: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(async_measure_lag(lag, stop))
+    refreshes: list[asyncio.Future] = []
+    requests_before = session.requests
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    origin = timeline[0]["t"] if timeline else 0
+    for record in timeline:
+        if args.speed:
+            delay = (record["t"] - origin) / args.speed - (time.perf_counter() - wall_started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        path, template = request_target(record["url"])
+        session.current[(path, template)] = record
+        refreshes.extend(
+            asyncio.ensure_future(hub.async_refresh(record["feature"]))
+            for hub in hubs_by_template[template])
+    await asyncio.gather(*refreshes)
+    await hass.async_block_till_done()
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    stop.set()
+    await probe
+    await fleet.teardown()
+
+    return {
+        "locations": args.locations,
+        "templates": len(templates),
+        "records": len(timeline),
+        "recorded_span_s": timeline[-1]["t"] - origin if timeline else 0,
+        "requests": session.requests - requests_before,
+        "missing_responses": session.misses,
+        "state_writes": sum(counter["writes"] for counter in counters),
+        "forecast_updates": sum(counter["forecasts"] for counter in counters),
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "cpu_ms_per_location": cpu / args.locations * 1000,
+        "cpu_utilization": cpu / wall if wall else 0.0,
+        "loop_lag": latency_summary(lag),
+        "memory": {
+            "bytes_per_location": memory / args.locations,
+            "peak_bytes": peak,
+        },
+    }
+
+
+async def async_main(args: argparse.Namespace) -> dict:
+    if args.log:
+        records = read_records(args.log)
+    else:
+        records = synthesize(args.synthetic_hours, args.templates)
+
+    results: dict = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "decoder": backend(),
+            "log": str(args.log) if args.log else None,
+            "speed": args.speed,
+            "latency": not args.no_latency,
+        },
+    }
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        try:
+            results["replay"] = await async_replay(hass, records, args)
+        finally:
+            await hass.async_stop(force=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", type=Path, help="recorded traffic log")
+    parser.add_argument("--synthetic-hours", type=float, default=6,
+                        help="hours of traffic to synthesize when no log is given")
+    parser.add_argument("--templates", type=int, default=10,
+                        help="distinct locations in the synthesized log")
+    parser.add_argument("--locations", type=int, default=1000)
+    parser.add_argument("--speed", type=float, default=0,
+                        help="replay speed-up, 0 replays without waiting")
+    parser.add_argument("--no-latency", action="store_true",
+                        help="ignore recorded request latencies")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = asyncio.run(async_main(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""和风天气集成的离线基准测试
+
+    python benchmarks/run.py --locations 1 10 100 1000 --output results.json
+
+需要安装 Home Assistant。所有请求都发往本地的替身服务器（见 server.py），
+结果以 json 输出，便于在版本之间比较。
+"""
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "custom_components"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from qweather import api  # noqa: E402
+from qweather.api import (WEATHER_ICONS, QWeatherData,  # noqa: E402
+                          format_condition, project_hourly,
+                          project_twice_daily)
+from qweather.const import (CONF_CACHE_TTL, CONF_DAILY_QUOTA,  # noqa: E402
+                            CONF_KEY, CONF_LOCATION, CONF_LOCATION_NAME)
+from qweather.decoder import backend  # noqa: E402
+from qweather.endpoints import QWeatherUpdateFeature  # noqa: E402
+from qweather.hub import QWeatherFleet  # noqa: E402
+from server import PAYLOADS, ServerOptions, start_server  # noqa: E402
+
+BENCH_KEY = "0" * 32
+
+# 与天气实体使用的数据相同
+WEATHER_FEATURES = (QWeatherUpdateFeature.NOW,
+                    QWeatherUpdateFeature.HOURLY, QWeatherUpdateFeature.DAILY)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def latency_summary(values: list[float]) -> dict[str, float]:
+    return {
+        "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 0.5) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "max_ms": max(values, default=0.0) * 1000,
+    }
+
+
+def subscribe(fleet: QWeatherFleet) -> None:
+    """代替天气实体订阅数据，hub 只获取被使用的数据"""
+    for hub in fleet.hubs:
+        hub.async_add_listener(lambda feature: None, WEATHER_FEATURES)
+
+
+def fleet_config(locations: int) -> dict:
+    return {
+        CONF_KEY: BENCH_KEY,
+        CONF_LOCATION_NAME: "bench",
+        CONF_LOCATION: ",".join(str(101000000 + i) for i in range(locations)),
+        CONF_CACHE_TTL: 0,
+        CONF_DAILY_QUOTA: 10 ** 9,
+    }
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    try:
+        hass = HomeAssistant(config_dir)
+    except TypeError:
+        # 旧版本的 Home Assistant
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+    return hass
+
+
+async def bench_hub_refresh(
+    hass: HomeAssistant, locations: int, rounds: int
+) -> dict:
+    """端到端的 hub 刷新：请求、解析、存储、通知"""
+    fleet = QWeatherFleet(hass, f"bench_{locations}", fleet_config(locations))
+    await fleet.asnyc_setup()
+    subscribe(fleet)
+
+    started = time.perf_counter()
+    await fleet.async_first_refresh()
+    first_refresh = time.perf_counter() - started
+
+    latencies: list[float] = []
+
+    async def _async_timed(coro) -> None:
+        begin = time.perf_counter()
+        await coro
+        latencies.append(time.perf_counter() - begin)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(
+            *(_async_timed(hub.async_update_weather_now()) for hub in fleet.hubs))
+        await asyncio.gather(
+            *(_async_timed(hub.async_update_weather_hourly()) for hub in fleet.hubs))
+        await asyncio.gather(
+            *(_async_timed(hub.async_update_weather_daily()) for hub in fleet.hubs))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "locations": locations,
+        "first_refresh_s": first_refresh,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+    }
+    await fleet.teardown()
+    return result
+
+
+async def bench_memory(hass: HomeAssistant, locations: int) -> dict:
+    """每个位置在拿到全部数据后占用的内存"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    fleet = QWeatherFleet(hass, f"memory_{locations}", fleet_config(locations))
+    await fleet.asnyc_setup()
+    subscribe(fleet)
+    await fleet.async_first_refresh()
+
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    await fleet.teardown()
+    return {"locations": locations, "bytes_per_location": size / locations}
+
+
+def bench_format_condition(number: int) -> dict:
+    icons = list(WEATHER_ICONS.items())
+
+    def by_icon() -> None:
+        for icon, text in icons:
+            format_condition(text, str(icon))
+
+    def by_text() -> None:
+        for _, text in icons:
+            format_condition(text)
+
+    return {
+        "items": len(icons),
+        "icon_us_per_call": min(timeit.repeat(by_icon, number=number, repeat=5))
+        / number / len(icons) * 1e6,
+        "text_us_per_call": min(timeit.repeat(by_text, number=number, repeat=5))
+        / number / len(icons) * 1e6,
+    }
+
+
+def rolling(hourly: list[dict], steps: int) -> list[dict]:
+    """在逐小时预报之后追加 steps 个小时，用于模拟预报逐小时滚动"""
+    last = datetime.fromisoformat(hourly[-1]["fxTime"])
+    return hourly + [
+        dict(hourly[step % len(hourly)],
+             fxTime=(last + timedelta(hours=step + 1)).isoformat(timespec="minutes"))
+        for step in range(steps)
+    ]
+
+
+def bench_projection(number: int) -> dict:
+    """各预报时长的解析与转换耗时，shifted 为预报滚动一小时后的更新与转换，window 只转换前 24 项"""
+    results = {}
+    for hourly_file, daily_file in (("24h", "7d"), ("72h", "15d"), ("168h", "30d")):
+        hourly = json.loads((PAYLOADS / f"{hourly_file}.json").read_bytes())["hourly"]
+        daily = json.loads((PAYLOADS / f"{daily_file}.json").read_bytes())["daily"]
+        weather = QWeatherData()
+        weather.update("hourly", hourly)
+        weather.update("daily", daily)
+
+        def timed(func) -> float:
+            return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+        def shifted(project) -> float:
+            # 每次更新预报向后滚动一个小时，重叠部分沿用上一次的转换结果
+            extended = rolling(hourly, number)
+            weather.update("hourly", hourly)
+            project()
+            started = time.perf_counter()
+            for step in range(1, number + 1):
+                weather.update("hourly", extended[step:step + len(hourly)])
+                project()
+            return (time.perf_counter() - started) / number * 1e6
+
+        results[f"{hourly_file}/{daily_file}"] = {
+            "hourly_items": len(hourly),
+            "daily_items": len(daily),
+            "ingest_hourly_us": timed(lambda: weather.update("hourly", hourly)),
+            "ingest_daily_us": timed(lambda: weather.update("daily", daily)),
+            "project_hourly_us": timed(lambda: project_hourly(weather.hourly_forecast)),
+            "project_twice_daily_us": timed(
+                lambda: project_twice_daily(weather.daily_forecast)),
+            "cached_hourly_us": timed(lambda: weather.hourly_projection),
+            "shifted_full_us": shifted(lambda: weather.hourly_projection),
+            "shifted_window_us": shifted(lambda: weather.hourly_window(24)),
+        }
+    return results
+
+
+async def async_main(args: argparse.Namespace) -> dict:
+    options = ServerOptions(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    runner, url = await start_server(options)
+    # 所有客户端都指向替身服务器
+    api.API_URL = url
+
+    results: dict = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "decoder": backend(),
+            "server": {
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "error_rate": args.error_rate,
+            },
+        },
+        "format_condition": bench_format_condition(args.number),
+        "projection": bench_projection(args.number),
+    }
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        try:
+            results["hub_refresh"] = [
+                await bench_hub_refresh(hass, locations, args.rounds)
+                for locations in args.locations
+            ]
+            results["memory"] = await bench_memory(hass, max(args.locations))
+        finally:
+            await hass.async_stop(force=True)
+            await runner.cleanup()
+
+    results["meta"]["server"]["requests"] = options.requests
+    results["meta"]["server"]["errors"] = options.errors
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--locations", type=int, nargs="+",
+                        default=[1, 10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = asyncio.run(async_main(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
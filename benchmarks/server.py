@@ -0,0 +1,115 @@
+"""本地的和风天气替身服务器，返回 payloads 目录中的数据
+
+    python benchmarks/server.py --port 8765 --latency 0.05 --error-rate 0.01
+
+也可以在基准测试中通过 start_server 启动。
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from aiohttp import web
+
+PAYLOADS = Path(__file__).resolve().parent / "payloads"
+
+# 和风天气的接口路径与 payloads 中的文件
+ENDPOINTS = {
+    "now": "now.json",
+    "24h": "24h.json",
+    "72h": "72h.json",
+    "168h": "168h.json",
+    "7d": "7d.json",
+    "15d": "15d.json",
+    "30d": "30d.json",
+}
+
+UPDATE_TIME = b'"updateTime":"2024-06-01T'
+
+
+@dataclass
+class ServerOptions:
+    latency: float = 0.0  # 每个请求的固定延迟（秒）
+    jitter: float = 0.0  # 额外的随机延迟上限（秒）
+    error_rate: float = 0.0  # 返回 HTTP 500 的比例
+    quota_error_rate: float = 0.0  # 返回和风天气额度错误（code 402）的比例
+    fresh: bool = True  # 每次响应都带上新的 updateTime，使客户端完整处理数据
+    requests: int = 0
+    errors: int = 0
+    seed: int = 0
+    _random: random.Random = field(default_factory=random.Random)
+
+
+def create_app(options: ServerOptions) -> web.Application:
+    options._random.seed(options.seed)
+    bodies = {name: (PAYLOADS / file).read_bytes() for name, file in ENDPOINTS.items()}
+
+    async def handle(request: web.Request) -> web.Response:
+        options.requests += 1
+        body = bodies.get(request.match_info["endpoint"])
+        if body is None:
+            raise web.HTTPNotFound
+
+        delay = options.latency + options._random.uniform(0, options.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = options._random.random()
+        if roll < options.error_rate:
+            options.errors += 1
+            raise web.HTTPInternalServerError
+        if roll < options.error_rate + options.quota_error_rate:
+            options.errors += 1
+            return web.json_response({"code": "402"})
+
+        if options.fresh:
+            # 用请求序号替换 updateTime 中的时分，长度保持不变
+            minutes = options.requests % (24 * 60)
+            stamp = f"{minutes // 60:02d}:{minutes % 60:02d}".encode()
+            start = body.find(UPDATE_TIME) + len(UPDATE_TIME)
+            body = body[:start] + stamp + body[start + 5:]
+
+        return web.Response(body=body, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/v7/weather/{endpoint}", handle)
+    return app
+
+
+async def start_server(
+    options: ServerOptions, host: str = "127.0.0.1", port: int = 0
+) -> tuple[web.AppRunner, str]:
+    """启动服务器，返回 runner 和和风天气 API 的根地址"""
+    runner = web.AppRunner(create_app(options), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/v7"
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    options = ServerOptions(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        quota_error_rate=args.quota_error_rate,
+        fresh=not args.static,
+    )
+    _, url = await start_server(options, args.host, args.port)
+    print(f"Serving QWeather stand-in at {url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--static", action="store_true",
+                        help="always return the same updateTime")
+    asyncio.run(_serve(parser.parse_args()))
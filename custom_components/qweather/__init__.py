@@ -4,19 +4,22 @@ import asyncio
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
 
 from .const import (
+    CONF_LOCATION,
     DOMAIN,
     STARTUP_MESSAGE,
+    STORAGE_VERSION,
 )
 
-from .hub import QWeatherHub
+from .hub import QWeatherFleet, parse_locations, storage_key
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = [
     Platform.WEATHER,
-    # Platform.SENSOR,
+    Platform.SENSOR,
 ]
 
 
@@ -26,11 +29,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if DOMAIN not in hass.data:
         _LOGGER.info(STARTUP_MESSAGE)
 
-    hub = QWeatherHub(hass, {**entry.data, **entry.options})
-    await hub.asnyc_setup()
+    fleet = QWeatherFleet(
+        hass, entry.entry_id, {**entry.data, **entry.options})
+    await fleet.asnyc_setup()
 
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = hub
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = fleet
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # 实体先注册，hub 据此得知哪些数据被使用，数据在后台并发获取，不阻塞 Home Assistant 启动
+    # 之后由调度器按照自适应的间隔统一刷新
+    entry.async_create_background_task(
+        hass,
+        fleet.async_first_refresh(),
+        f"{DOMAIN} first refresh {entry.title}",
+    )
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
@@ -57,3 +69,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    for location in parse_locations(entry.data[CONF_LOCATION]):
+        await Store(
+            hass, STORAGE_VERSION, storage_key(entry.entry_id, location)
+        ).async_remove()
@@ -1,17 +1,22 @@
 import logging
+import time
 import urllib.parse
 from asyncio import TimeoutError as AsyncTimeoutError
+from collections.abc import Callable, Mapping, Sequence
+from datetime import date, datetime
+from typing import Any
 
-from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from aiohttp import ClientError, ClientSession
 
 from homeassistant.components.weather import (
-    ATTR_CONDITION_CLOUDY, ATTR_CONDITION_EXCEPTIONAL, ATTR_CONDITION_FOG,
+    ATTR_CONDITION_CLEAR_NIGHT, ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_EXCEPTIONAL, ATTR_CONDITION_FOG,
     ATTR_CONDITION_HAIL, ATTR_CONDITION_LIGHTNING_RAINY,
     ATTR_CONDITION_PARTLYCLOUDY, ATTR_CONDITION_POURING, ATTR_CONDITION_RAINY,
     ATTR_CONDITION_SNOWY, ATTR_CONDITION_SNOWY_RAINY, ATTR_CONDITION_SUNNY,
     ATTR_CONDITION_WINDY, ATTR_CONDITION_WINDY_VARIANT,
     ATTR_FORECAST_CLOUD_COVERAGE, ATTR_FORECAST_CONDITION,
-    ATTR_FORECAST_DEW_POINT, ATTR_FORECAST_HUMIDITY,
+    ATTR_FORECAST_DEW_POINT, ATTR_FORECAST_HUMIDITY, ATTR_FORECAST_IS_DAYTIME,
     ATTR_FORECAST_NATIVE_PRECIPITATION, ATTR_FORECAST_NATIVE_PRESSURE,
     ATTR_FORECAST_NATIVE_TEMP, ATTR_FORECAST_NATIVE_TEMP_LOW,
     ATTR_FORECAST_NATIVE_WIND_SPEED, ATTR_FORECAST_PRECIPITATION_PROBABILITY,
@@ -19,14 +24,25 @@ from homeassistant.components.weather import (
     ATTR_WEATHER_APPARENT_TEMPERATURE, ATTR_WEATHER_CLOUD_COVERAGE,
     ATTR_WEATHER_DEW_POINT, ATTR_WEATHER_HUMIDITY, ATTR_WEATHER_PRESSURE,
     ATTR_WEATHER_TEMPERATURE, ATTR_WEATHER_VISIBILITY,
-    ATTR_WEATHER_WIND_BEARING, ATTR_WEATHER_WIND_SPEED)
+    ATTR_WEATHER_WIND_BEARING, ATTR_WEATHER_WIND_SPEED, Forecast)
 from homeassistant.const import UnitOfTemperature
+from homeassistant.util import dt as dt_util
+
+from .budget import QWeatherBudgetExceeded
+from .cache import QWeatherRequestCache, is_success
+from .decoder import QWeatherDecodeError
+from .endpoints import ENDPOINTS, QWeatherEndpoint, QWeatherUpdateFeature
+from .keys import QWeatherKeyPool
+from .recorder import QWeatherRecorder
+from .metrics import QWeatherRequestMetrics
+from .model import (QWeatherMinutely, QWeatherNow, QWeatherSeries,
+                    QWeatherSeriesDiff, diff_series)
 
 _LOGGER = logging.getLogger(__name__)
 
 TEMP_CELSIUS: str = UnitOfTemperature.CELSIUS
 
-API_URL: str = "https://devapi.qweather.com/v7/weather"
+API_URL: str = "https://devapi.qweather.com/v7"
 
 WEATHER_CONDITIONS_MAP = {
     ATTR_CONDITION_SUNNY: ["晴"],
@@ -34,14 +50,14 @@ WEATHER_CONDITIONS_MAP = {
     ATTR_CONDITION_PARTLYCLOUDY: ["少云", "晴间多云", "阴"],
     ATTR_CONDITION_WINDY: ["有风", "微风", "和风", "清风"],
     ATTR_CONDITION_WINDY_VARIANT: ["强风", "劲风", "疾风", "大风", "烈风", "飓风", "龙卷风", "热带风暴", "狂暴风", "风暴"],
-    ATTR_CONDITION_RAINY: ["雨", "毛毛雨", "细雨", "小雨", "小到中雨", "中雨", "中到大雨", "大雨", "大到暴雨", "阵雨", "极端降雨", "冻雨"],
+    ATTR_CONDITION_RAINY: ["雨", "毛毛雨", "细雨", "毛毛雨/细雨", "小雨", "小到中雨", "中雨", "中到大雨", "大雨", "大到暴雨", "阵雨", "极端降雨", "冻雨"],
     ATTR_CONDITION_POURING: ["暴雨", "暴雨到大暴雨", "大暴雨", "大暴雨到特大暴雨", "特大暴雨", "强阵雨"],
     ATTR_CONDITION_LIGHTNING_RAINY: ["雷阵雨", "强雷阵雨"],
     ATTR_CONDITION_FOG: ["雾", "薄雾", "霾", "浓雾", "强浓雾", "中度霾", "重度霾", "严重霾", "大雾", "特强浓雾"],
     ATTR_CONDITION_HAIL: ["雷阵雨伴有冰雹"],
-    ATTR_CONDITION_SNOWY: ["小雪", "小到中雪", "中雪", "中到大雪", "大雪", "大到暴雪", "暴雪", "阵雪"],
+    ATTR_CONDITION_SNOWY: ["雪", "小雪", "小到中雪", "中雪", "中到大雪", "大雪", "大到暴雪", "暴雪", "阵雪"],
     ATTR_CONDITION_SNOWY_RAINY: ["雨夹雪", "雨雪天气", "阵雨夹雪"],
-    ATTR_CONDITION_EXCEPTIONAL: ["扬沙", "浮尘", "沙尘暴", "强沙尘暴", "未知"],
+    ATTR_CONDITION_EXCEPTIONAL: ["扬沙", "浮尘", "沙尘暴", "强沙尘暴", "热", "冷", "未知"],
 }
 
 FORECAST_NOW_MAP = {
@@ -55,6 +71,7 @@ FORECAST_NOW_MAP = {
     ATTR_WEATHER_HUMIDITY: "humidity",  # 湿度
     ATTR_WEATHER_VISIBILITY: "vis",  # 能见度
     ATTR_WEATHER_PRESSURE: "pressure",  # 大气压强
+    ATTR_FORECAST_NATIVE_PRECIPITATION: "precip",  # 过去1小时降水量
 }
 
 FORECAST_HOURLY_MAP = {
@@ -99,155 +116,570 @@ FORECAST_DAILY_MAP_NIGHT = {
     ATTR_FORECAST_UV_INDEX: "uvIndex",  # 紫外线强度指数
 }
 
-CONDITION_CLASSES = {
-    'sunny': ["晴"],
-    'cloudy': ["多云"],
-    'partlycloudy': ["少云", "晴间多云", "阴"],
-    'windy': ["有风", "微风", "和风", "清风"],
-    'windy-variant': ["强风", "劲风", "疾风", "大风", "烈风"],
-    'hurricane': ["飓风", "龙卷风", "热带风暴", "狂暴风", "风暴"],
-    'rainy': ["雨", "毛毛雨", "细雨", "小雨", "小到中雨", "中雨", "中到大雨", "大雨", "大到暴雨", "阵雨", "极端降雨", "冻雨"],
-    'pouring': ["暴雨", "暴雨到大暴雨", "大暴雨", "大暴雨到特大暴雨", "特大暴雨", "强阵雨"],
-    'lightning-rainy': ["雷阵雨", "强雷阵雨"],
-    'fog': ["雾", "薄雾", "霾", "浓雾", "强浓雾", "中度霾", "重度霾", "严重霾", "大雾", "特强浓雾"],
-    'hail': ["雷阵雨伴有冰雹"],
-    'snowy': ["小雪", "小到中雪", "中雪", "中到大雪", "大雪", "大到暴雪", "暴雪", "阵雪"],
-    'snowy-rainy': ["雨夹雪", "雨雪天气", "阵雨夹雪"],
-    'exceptional': ["扬沙", "浮尘", "沙尘暴", "强沙尘暴", "未知"],
+# 和风天气图标代码，见 https://dev.qweather.com/docs/resource/icons/
+WEATHER_ICONS: dict[int, str] = {
+    100: "晴", 101: "多云", 102: "少云", 103: "晴间多云", 104: "阴",
+    150: "晴", 151: "多云", 152: "少云", 153: "晴间多云",
+    300: "阵雨", 301: "强阵雨", 302: "雷阵雨", 303: "强雷阵雨", 304: "雷阵雨伴有冰雹",
+    305: "小雨", 306: "中雨", 307: "大雨", 308: "极端降雨", 309: "毛毛雨",
+    310: "暴雨", 311: "大暴雨", 312: "特大暴雨", 313: "冻雨", 314: "小到中雨",
+    315: "中到大雨", 316: "大到暴雨", 317: "暴雨到大暴雨", 318: "大暴雨到特大暴雨",
+    350: "阵雨", 351: "强阵雨", 399: "雨",
+    400: "小雪", 401: "中雪", 402: "大雪", 403: "暴雪", 404: "雨夹雪",
+    405: "雨雪天气", 406: "阵雨夹雪", 407: "阵雪", 408: "小到中雪", 409: "中到大雪",
+    410: "大到暴雪", 456: "阵雨夹雪", 457: "阵雪", 499: "雪",
+    500: "薄雾", 501: "雾", 502: "霾", 503: "扬沙", 504: "浮尘", 507: "沙尘暴",
+    508: "强沙尘暴", 509: "浓雾", 510: "强浓雾", 511: "中度霾", 512: "重度霾",
+    513: "严重霾", 514: "大雾", 515: "特强浓雾",
+    900: "热", 901: "冷", 999: "未知",
 }
 
+# 夜间图标中与白天含义不同的天气状况
+WEATHER_ICONS_NIGHT: dict[int, str] = {
+    150: ATTR_CONDITION_CLEAR_NIGHT,
+}
+
+CONDITION_BY_TEXT: dict[str, str] = {
+    text: condition
+    for condition, texts in WEATHER_CONDITIONS_MAP.items()
+    for text in texts
+}
+
+CONDITION_BY_ICON: dict[int, str] = {
+    icon: WEATHER_ICONS_NIGHT.get(icon) or CONDITION_BY_TEXT[text]
+    for icon, text in WEATHER_ICONS.items()
+}
 
-def format_condition(condition: str) -> str:
-    for key, value in WEATHER_CONDITIONS_MAP.items():
-        if condition in value:
-            return key
-    return condition
+
+def format_condition(
+    condition: str | None, icon: int | str | None = None, is_daytime: bool = True
+) -> str | None:
+    """转换为 Home Assistant 的天气状况，优先使用图标代码，其次使用天气描述"""
+    result = None
+    if icon is not None:
+        try:
+            result = CONDITION_BY_ICON.get(int(icon))
+        except ValueError:
+            pass
+
+    if result is None:
+        result = CONDITION_BY_TEXT.get(condition, condition)
+
+    if not is_daytime and result == ATTR_CONDITION_SUNNY:
+        return ATTR_CONDITION_CLEAR_NIGHT
+    return result
+
+
+def _output_column(
+    series: QWeatherSeries, field: str, start: int = 0, stop: int | None = None
+) -> Sequence[Any]:
+    """将列中 [start, stop) 的部分转换为 Home Assistant 预报中的值，缺失值为 None"""
+    kind = series.fields[field]
+    column = series.column(field)[start:stop]
+    if kind is int:
+        return [None if v != v else int(v) for v in column]
+    if kind is float:
+        return [None if v != v else v for v in column]
+    if kind is datetime or kind is date:
+        return [None if v is None else v.isoformat() for v in column]
+    return column
+
+
+def _project(
+    series: QWeatherSeries,
+    mapping: Mapping[str, str],
+    icon_field: str,
+    is_daytime: bool | None = None,
+    start: int = 0,
+    stop: int | None = None,
+) -> list[Forecast]:
+    keys: list[str] = []
+    columns: list[Sequence[Any]] = []
+    for ha_key, field in mapping.items():
+        if ha_key == ATTR_FORECAST_CONDITION:
+            column = [
+                format_condition(text, icon, is_daytime is not False)
+                for text, icon in zip(
+                    series.column(field)[start:stop],
+                    _output_column(series, icon_field, start, stop))
+            ]
+        else:
+            column = _output_column(series, field, start, stop)
+        keys.append(ha_key)
+        columns.append(column)
+
+    ha_forecast: list[Forecast] = []
+    for row in zip(*columns):
+        ha_item: Forecast = {k: v for k, v in zip(keys, row) if v is not None}
+        if is_daytime is not None:
+            ha_item[ATTR_FORECAST_IS_DAYTIME] = is_daytime
+        ha_forecast.append(ha_item)
+    return ha_forecast
+
+
+def project_twice_daily_rows(
+    forecast: QWeatherSeries, start: int = 0, stop: int | None = None
+) -> list[tuple[Forecast, ...]]:
+    """将逐天预报中 [start, stop) 的每一天转换为 Home Assistant 的白天和夜间预报"""
+    day = _project(forecast, FORECAST_DAILY_MAP_DAY, "iconDay", True, start, stop)
+    night = _project(forecast, FORECAST_DAILY_MAP_NIGHT, "iconNight", False, start, stop)
+    return list(zip(day, night))
+
+
+def project_hourly_rows(
+    forecast: QWeatherSeries, start: int = 0, stop: int | None = None
+) -> list[tuple[Forecast, ...]]:
+    """将逐小时预报中 [start, stop) 的每个时间点转换为 Home Assistant 的预报"""
+    return [(item,) for item in _project(forecast, FORECAST_HOURLY_MAP, "icon", None, start, stop)]
+
+
+def project_twice_daily(forecast: QWeatherSeries) -> list[Forecast]:
+    """将逐天预报转换为 Home Assistant 的白天/夜间预报"""
+    return [item for pair in project_twice_daily_rows(forecast) for item in pair]
+
+
+def project_hourly(forecast: QWeatherSeries) -> list[Forecast]:
+    """将逐小时预报转换为 Home Assistant 的预报"""
+    return _project(forecast, FORECAST_HOURLY_MAP, "icon")
+
+
+class QWeatherProjection:
+    """某项预报序列的 Home Assistant 格式，只转换被请求的窗口
+
+    逐行的转换结果以 diff_key 的值为键缓存：预报只是滚动（shifted）时重叠部分沿用上一次的结果，
+    只转换新增的行；同一数据版本下相同的窗口直接返回同一个列表。
+    """
+
+    __slots__ = ("project", "key", "generation", "rows", "windows")
+
+    def __init__(
+        self,
+        project: Callable[[QWeatherSeries, int, int | None], list[tuple[Forecast, ...]]],
+        key: str,
+    ) -> None:
+        self.project = project
+        self.key: str = key
+        self.generation: int = -1
+        self.rows: dict[Any, tuple[Forecast, ...]] = {}
+        self.windows: dict[tuple[int, int], list[Forecast]] = {}
+
+    def invalidate(self) -> None:
+        """序列的内容发生变化，丢弃逐行的缓存"""
+        self.rows = {}
+
+    def window(
+        self, series: QWeatherSeries, generation: int, start: int, stop: int
+    ) -> list[Forecast]:
+        if generation != self.generation:
+            self.generation = generation
+            self.windows = {}
+            keys = series.column(self.key)
+            self.rows = {key: self.rows[key] for key in keys if key in self.rows}
+
+        cached = self.windows.get((start, stop))
+        if cached is not None:
+            return cached
+
+        keys = series.column(self.key)
+        missing = [i for i in range(start, stop) if keys[i] not in self.rows]
+        if missing:
+            # 缺失的行通常连续（滚动时新增在末尾），按列一次转换
+            first, last = missing[0], missing[-1] + 1
+            for key, items in zip(keys[first:last], self.project(series, first, last)):
+                self.rows[key] = items
+
+        result = [item for key in keys[start:stop] for item in self.rows[key]]
+        self.windows[(start, stop)] = result
+        return result
 
 
 class QWeatherData:
-    """存储从和风天气API查询到的天气数据"""
+    """存储从和风天气API查询到的天气数据，每个已注册的接口一项"""
 
     def __init__(self) -> None:
-        self.__current_weather_data: dict = {}
-        self.daily_forecast: list[dict] = []
-        self.hourly_forecast: list[dict] = []
+        self._values: dict[str, Any] = {}
+        # generation 标记数据版本，预报只在数据更新后的首次读取时转换一次
+        self._generations: dict[str, int] = {}
+        self._projections: dict[str, QWeatherProjection] = {
+            QWeatherUpdateFeature.HOURLY: QWeatherProjection(project_hourly_rows, "fxTime"),
+            QWeatherUpdateFeature.DAILY: QWeatherProjection(project_twice_daily_rows, "fxDate"),
+        }
+
+    def update(self, name: str, data: Any) -> QWeatherSeriesDiff | None:
+        """使用接口的解析函数更新某项数据，接口支持合并时合并到已有的数据中
+
+        预报序列与上一次的数据比较，完全相同时保留原有的数据及其转换结果，返回两者的差异。
+        """
+        endpoint = ENDPOINTS[name]
+        value = self._values.get(name)
+        diff = None
+        if endpoint.merge is not None and value is not None:
+            endpoint.merge(value, data)
+        else:
+            parsed = endpoint.parse(data)
+            if endpoint.diff_key is not None and value is not None:
+                diff = diff_series(value, parsed, endpoint.diff_key)
+                if diff.kind == QWeatherSeriesDiff.UNCHANGED:
+                    return diff
+            if (
+                name in self._projections
+                and (diff is None or diff.kind != QWeatherSeriesDiff.SHIFTED)
+            ):
+                self._projections[name].invalidate()
+            self._values[name] = parsed
+        self._generations[name] = self.generation(name) + 1
+        return diff
+
+    def get(self, name: str) -> Any:
+        """某项数据，尚未获取时为接口的默认值"""
+        value = self._values.get(name)
+        return ENDPOINTS[name].empty if value is None else value
+
+    def generation(self, name: str) -> int:
+        return self._generations.get(name, 0)
+
+    def _window(
+        self, name: str, count: int | None, since: Any | None
+    ) -> list[Forecast]:
+        series: QWeatherSeries = self.get(name)
+        projection = self._projections[name]
+        start = 0 if since is None else series.index(projection.key, since)
+        stop = len(series) if count is None else min(len(series), start + count)
+        return projection.window(series, self.generation(name), start, max(start, stop))
+
+    @property
+    def hourly_forecast(self) -> QWeatherSeries:
+        return self.get(QWeatherUpdateFeature.HOURLY)
+
+    @property
+    def daily_forecast(self) -> QWeatherSeries:
+        return self.get(QWeatherUpdateFeature.DAILY)
+
+    @property
+    def minutely(self) -> QWeatherMinutely | None:
+        return self.get(QWeatherUpdateFeature.MINUTELY)
 
-    def update_weather_now(self, data: dict) -> None:
-        weather_data = {}
-        weather_data[ATTR_FORECAST_CONDITION] = data.get(
-            FORECAST_NOW_MAP[ATTR_FORECAST_CONDITION])
-        weather_data[ATTR_WEATHER_TEMPERATURE] = (
-            FORECAST_NOW_MAP[ATTR_FORECAST_CONDITION])
+    @property
+    def hourly_projection(self) -> list[Forecast]:
+        """逐小时预报，数据未更新时返回同一个列表"""
+        return self._window(QWeatherUpdateFeature.HOURLY, None, None)
 
-        self.__current_weather_data = data
+    @property
+    def twice_daily_projection(self) -> list[Forecast]:
+        """白天/夜间预报，数据未更新时返回同一个列表"""
+        return self._window(QWeatherUpdateFeature.DAILY, None, None)
+
+    def hourly_window(
+        self, count: int | None = None, since: datetime | None = None
+    ) -> list[Forecast]:
+        """从 since 起（默认从第一项起）的 count 个时间点的逐小时预报，只转换这部分"""
+        return self._window(QWeatherUpdateFeature.HOURLY, count, since)
+
+    def twice_daily_window(
+        self, count: int | None = None, since: date | None = None
+    ) -> list[Forecast]:
+        """从 since 起（默认从第一天起）的 count 天的白天/夜间预报，只转换这部分"""
+        return self._window(QWeatherUpdateFeature.DAILY, count, since)
+
+    def as_dict(self) -> dict[str, Any]:
+        """已解析的数据，用于持久化"""
+        return {
+            name: ENDPOINTS[name].dump(value)
+            for name, value in self._values.items()
+        }
 
-    def update_weather_hourly(self, data: list[dict]) -> None:
-        self.hourly_forecast = data
+    def now_value(self, attr: str) -> Any:
+        """实时天气中 FORECAST_NOW_MAP 的某一项"""
+        now = self.now
+        if now is None:
+            return None
+        return now.get(FORECAST_NOW_MAP[attr])
 
-    def update_weather_daily(self, data: list[dict]) -> None:
-        self.daily_forecast = data
+    @property
+    def now(self) -> QWeatherNow | None:
+        return self.get(QWeatherUpdateFeature.NOW)
 
     @property
     def condition(self) -> str | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_FORECAST_CONDITION])
+        now = self.now
+        if now is None:
+            return None
+        return format_condition(now.text, now.icon)
 
     @property
     def temperature(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_TEMPERATURE])
+        return self.now_value(ATTR_WEATHER_TEMPERATURE)
 
     @property
     def apparent_temperature(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_APPARENT_TEMPERATURE])
+        return self.now_value(ATTR_WEATHER_APPARENT_TEMPERATURE)
 
     @property
     def dew_point(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_DEW_POINT])
+        return self.now_value(ATTR_WEATHER_DEW_POINT)
 
     @property
     def wind_bearing(self) -> int | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_WIND_BEARING])
+        return self.now_value(ATTR_WEATHER_WIND_BEARING)
 
     @property
-    def wind_speed(self) -> int | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_WIND_SPEED])
+    def wind_speed(self) -> float | None:
+        return self.now_value(ATTR_WEATHER_WIND_SPEED)
 
     @property
     def cloud_coverage(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_CLOUD_COVERAGE])
+        return self.now_value(ATTR_WEATHER_CLOUD_COVERAGE)
 
     @property
     def humidity(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_HUMIDITY])
+        return self.now_value(ATTR_WEATHER_HUMIDITY)
 
     @property
     def visibility(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_VISIBILITY])
+        return self.now_value(ATTR_WEATHER_VISIBILITY)
 
     @property
     def pressure(self) -> float | None:
-        return self.__current_weather_data.get(FORECAST_NOW_MAP[ATTR_WEATHER_PRESSURE])
+        return self.now_value(ATTR_WEATHER_PRESSURE)
 
+    @property
+    def precipitation(self) -> float | None:
+        return self.now_value(ATTR_FORECAST_NATIVE_PRECIPITATION)
 
-class QWeatherUpdateFeature:
-    NOW = 1
-    HOURLY = 2
-    DAILY = 3
 
+def feature_priority(endpoint: QWeatherEndpoint, now: datetime) -> int:
+    """请求额度紧张时的优先级，数值越小越优先
 
-def __nameof_feature(feature: QWeatherUpdateFeature) -> str:
-    match feature:
-        case QWeatherUpdateFeature.NOW:
-            return "now"
-        case QWeatherUpdateFeature.HOURLY:
-            return "hourly"
-        case QWeatherUpdateFeature.DAILY:
-            return "daily"
-        case _:
-            return ""
+    平时实时天气 > 逐小时预报 > 逐天预报，临近午夜时逐天预报会发布新一天的数据，顺序反转。
+    """
+    return endpoint.priority[1 if now.hour == 23 or now.hour == 0 else 0]
+
+
+class QWeatherFeatureState:
+    """记录某项数据最近一次的版本，用于跳过未变化的响应"""
+
+    __slots__ = ("name", "update_time", "fetched_at", "stale", "refreshes",
+                 "unchanged", "metrics", "diffs", "last_diff")
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.update_time: str | None = None
+        self.fetched_at: datetime | None = None
+        # 从磁盘恢复、尚未被一次成功请求确认的数据为过期数据
+        self.stale: bool = False
+        self.refreshes: int = 0
+        self.unchanged: int = 0
+        self.metrics: QWeatherRequestMetrics = QWeatherRequestMetrics()
+        # 预报序列每种差异的次数
+        self.diffs: dict[str, int] = {}
+        self.last_diff: QWeatherSeriesDiff | None = None
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "update_time": self.update_time,
+            "refreshes": self.refreshes,
+            "unchanged": self.unchanged,
+            "diffs": dict(self.diffs),
+            "last_diff": self.last_diff.stats if self.last_diff is not None else None,
+        }
 
 
 class QWeatherClient:
     """和风天气客户端"""
 
-    def __init__(self, key: str, location: str) -> None:
-        data = {
-            "location": location,
-            "key": key
+    def __init__(
+        self,
+        keys: QWeatherKeyPool,
+        location: str,
+        cache: QWeatherRequestCache,
+        cache_ttl: float | None = None,
+        coordinates: str | None = None,
+        horizons: Mapping[str, str] | None = None,
+    ) -> None:
+        self.session: ClientSession | None = None
+        # 设置后记录每次请求和响应，用于离线回放
+        self.recorder: QWeatherRecorder | None = None
+        self._cache = cache
+        self._cache_ttl = cache_ttl
+        self._keys = keys
+
+        # 以经纬度查询的接口在没有坐标时不可用，预报的时长由条目的选项决定
+        # 不含 key 的 url 作为请求缓存的 key，使用不同 key 的相同请求共享结果
+        horizons = horizons or {}
+        # 接口路径区分预报时长，无访问权限的 key 按路径冷却
+        self._paths: dict[str, str] = {
+            name: endpoint.path_for(horizons.get(name))
+            for name, endpoint in ENDPOINTS.items()
+        }
+        self._cache_keys: dict[str, str] = {
+            name: f"{API_URL}/{self._paths[name]}?"
+            + urllib.parse.urlencode({
+                "location": coordinates if endpoint.coordinates else location,
+                **endpoint.params,
+            })
+            for name, endpoint in ENDPOINTS.items()
+            if coordinates is not None or not endpoint.coordinates
+        }
+        # 每个 key 的完整 url 预先生成，切换 key 时无需重新拼接
+        self._urls: dict[str, dict[str, str]] = {
+            name: {
+                key.key: f"{cache_key}&{urllib.parse.urlencode({'key': key.key})}"
+                for key in keys.keys
+            }
+            for name, cache_key in self._cache_keys.items()
         }
-
-        query_string = urllib.parse.urlencode(data)
-        self._weather_days = f"{API_URL}/7d?{query_string}"
-        self._weather_hourly = f"{API_URL}/24h?{query_string}"
-        self._weather_now_url = f"{API_URL}/now?{query_string}"
         self._weather = QWeatherData()
+        self._states: dict[str, QWeatherFeatureState] = {
+            name: QWeatherFeatureState(name) for name in ENDPOINTS
+        }
 
-    async def async_update_weather(self, feature: QWeatherUpdateFeature) -> None:
-        """更新天气数据"""
+    async def async_update_weather(self, feature: str) -> bool:
+        """更新天气数据，数据有变化或过期数据被确认时返回 True"""
 
         _LOGGER.info("Update weather data from qweather")
 
-        try:
-            async with ClientSession(connector=TCPConnector(limit=10), timeout=ClientTimeout(total=20)) as session:
-                match feature:
-                    case QWeatherUpdateFeature.NOW:
-                        async with session.get(self._weather_now_url) as response:
-                            data = await response.json()
-                            weather: dict = data["now"]
-                            self._weather.update_weather_now(weather)
-                    case QWeatherUpdateFeature.HOURLY:
-                        async with session.get(self._weather_hourly) as response:
-                            data = await response.json()
-                            forecast: list[dict] = data["hourly"]
-                            self._weather.update_weather_hourly(forecast)
-                    case QWeatherUpdateFeature.DAILY:
-                        async with session.get(self._weather_days) as response:
-                            data = await response.json()
-                            forecast: list[dict] = data["daily"]
-                            self._weather.update_weather_daily(forecast)
-        except (ClientError, AsyncTimeoutError):
-            _LOGGER.error(
-                f"Error while update weather in {__nameof_feature(feature)}")
-            return
+        session = self.session
+        if session is None:
+            _LOGGER.error("QWeather client has no http session")
+            return False
+
+        endpoint = ENDPOINTS[feature]
+        cache_key = self._cache_keys.get(feature)
+        if cache_key is None:
+            _LOGGER.debug("No coordinates for %s", feature)
+            return False
+
+        state = self._states[feature]
+        state.refreshes += 1
+        metrics = state.metrics
+        ttl = endpoint.ttl if self._cache_ttl is None else min(endpoint.ttl, self._cache_ttl)
+        priority = feature_priority(endpoint, dt_util.now())
+
+        # 认证或额度出错的 key 进入冷却，换一个 key 重试
+        path = self._paths[feature]
+        tried: set[str] = set()
+        while True:
+            key = self._keys.select(tried, path)
+            if key is None:
+                _LOGGER.debug("No available key, skip %s", state.name)
+                metrics.record_failure("QWeatherNoAvailableKey", dt_util.utcnow())
+                return False
+            tried.add(key.key)
+
+            started = time.perf_counter()
+            try:
+                data, requester = await self._cache.async_get(
+                    session,
+                    self._urls[feature][key.key],
+                    ttl,
+                    key.budget,
+                    priority,
+                    metrics,
+                    cache_key,
+                    key.key,
+                )
+            except QWeatherBudgetExceeded:
+                _LOGGER.debug("Request budget exhausted, skip %s", state.name)
+                metrics.record_failure("QWeatherBudgetExceeded", dt_util.utcnow())
+                return False
+            except (ClientError, AsyncTimeoutError, QWeatherDecodeError) as err:
+                latency = time.perf_counter() - started
+                metrics.record_latency(latency)
+                metrics.record_failure(type(err).__name__, dt_util.utcnow())
+                if self.recorder is not None:
+                    self.recorder.record(
+                        feature, cache_key, latency, error=type(err).__name__)
+                _LOGGER.error("Error while update weather in %s: %r", state.name, err)
+                return False
+
+            latency = time.perf_counter() - started
+            metrics.record_latency(latency)
+            if self.recorder is not None:
+                self.recorder.record(feature, cache_key, latency, data)
+
+            if is_success(data):
+                # 共享自其他 key 的结果不计入这个 key 的成功次数
+                if requester == key.key:
+                    key.record_success(path)
+                break
+
+            # 出错的响应不会共享给使用其他 key 的调用者，错误码属于这个 key
+            code = data.get("code")
+            metrics.record_failure(f"code_{code}", dt_util.utcnow())
+            if (cooldown := key.record_error(code, path)) is None:
+                _LOGGER.error(
+                    "QWeather returned code %s while update weather in %s", code, state.name)
+                return False
+            _LOGGER.warning(
+                "QWeather returned code %s for key %s on %s, skip it for %ds",
+                code, key.label, path, cooldown)
+
+        metrics.record_success(dt_util.utcnow())
+        was_stale, state.stale = state.stale, False
+
+        # updateTime 只在和风天气发布新数据时变化
+        update_time = data.get("updateTime")
+        if update_time is not None and update_time == state.update_time:
+            state.unchanged += 1
+            # 过期数据被确认仍是最新的，需要通知实体更新过期标记
+            return was_stale
+
+        diff = self._weather.update(
+            feature, data if endpoint.data_key is None else data[endpoint.data_key])
+        state.update_time = update_time
+        state.fetched_at = dt_util.utcnow()
+        if diff is not None:
+            state.diffs[diff.kind] = state.diffs.get(diff.kind, 0) + 1
+            state.last_diff = diff
+            if diff.kind == QWeatherSeriesDiff.UNCHANGED:
+                # 重新发布了相同的预报，转换结果不变，无需通知
+                state.unchanged += 1
+                return was_stale
+        return True
+
+    def restore(self, stored: Mapping[str, Any]) -> None:
+        """从磁盘缓存恢复数据，恢复的数据被标记为过期"""
+        for feature, state in self._states.items():
+            item = stored.get(state.name)
+            if not item or item.get("data") is None:
+                continue
+
+            self._weather.update(feature, item["data"])
+            state.update_time = item.get("update_time")
+            state.fetched_at = dt_util.parse_datetime(item.get("fetched_at") or "")
+            state.stale = True
+
+    def as_storage(self) -> dict[str, dict[str, Any]]:
+        """已获取的数据及其获取时间，用于持久化"""
+        payloads = self._weather.as_dict()
+        return {
+            state.name: {
+                "data": payloads[state.name],
+                "update_time": state.update_time,
+                "fetched_at": state.fetched_at.isoformat() if state.fetched_at else None,
+            }
+            for state in self._states.values()
+            if state.fetched_at is not None
+        }
+
+    def state(self, feature: str) -> QWeatherFeatureState:
+        return self._states[feature]
+
+    def supports(self, feature: str) -> bool:
+        """某项数据是否可以获取，以经纬度查询的接口需要坐标"""
+        return feature in self._cache_keys
+
+    @property
+    def refresh_stats(self) -> dict[str, dict[str, Any]]:
+        """各项数据的刷新统计，unchanged 为未产生新数据的刷新次数，diffs 为预报序列的差异分类"""
+        return {state.name: state.stats for state in self._states.values()}
+
+    @property
+    def request_stats(self) -> dict[str, dict[str, Any]]:
+        """各项数据的请求统计"""
+        now = dt_util.utcnow()
+        return {state.name: state.metrics.stats(now) for state in self._states.values()}
 
     @property
     def weather(self) -> QWeatherData:
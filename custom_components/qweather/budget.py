@@ -0,0 +1,115 @@
+import logging
+import time
+from datetime import date
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_BUDGETS = f"{DOMAIN}_budgets"
+
+SECONDS_PER_DAY = 86400
+# 令牌桶容量至少能容纳的请求数，保证启动时可以获取所有数据
+MIN_BURST = 10
+# 每降低一级优先级，需要在桶中额外保留的令牌比例
+PRIORITY_RESERVE = 0.2
+# 额度紧张时可选数据刷新间隔最多放大的倍数
+MAX_STRETCH = 4.0
+
+
+class QWeatherBudgetExceeded(Exception):
+    """请求额度不足"""
+
+
+class QWeatherBudget:
+    """某个 API key 的请求额度
+
+    令牌按每日额度均匀补充，请求被平摊到一整天；
+    额度紧张时，低优先级的请求需要桶中保留更多令牌才能发出。
+    """
+
+    def __init__(self, daily_quota: int) -> None:
+        self.daily_quota: int = daily_quota
+        self.tokens: float = self.capacity
+        self.used_today: int = 0
+        self.denied: int = 0
+        self._refilled_at: float = time.monotonic()
+        self._day: date = dt_util.now().date()
+
+    @property
+    def capacity(self) -> float:
+        """令牌桶容量，约为一小时的额度"""
+        return max(MIN_BURST, self.daily_quota / 24)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        rate = self.daily_quota / SECONDS_PER_DAY
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+        today = dt_util.now().date()
+        if today != self._day:
+            self._day = today
+            self.used_today = 0
+
+    def try_acquire(self, priority: int = 0) -> bool:
+        """尝试消耗一次请求额度，priority 越小越优先"""
+        self._refill()
+
+        required = 1 + self.capacity * PRIORITY_RESERVE * priority
+        if self.used_today >= self.daily_quota or self.tokens < required:
+            self.denied += 1
+            return False
+
+        self.tokens -= 1
+        self.used_today += 1
+        return True
+
+    @property
+    def available(self) -> float:
+        """当前桶中的令牌数"""
+        self._refill()
+        return self.tokens
+
+    @property
+    def stretch(self) -> float:
+        """令牌不足一半时，可选数据刷新间隔的放大倍数"""
+        return stretch_factor(self.available, self.capacity)
+
+    @property
+    def remaining_today(self) -> int:
+        return max(0, self.daily_quota - self.used_today)
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        self._refill()
+        return {
+            "daily_quota": self.daily_quota,
+            "used_today": self.used_today,
+            "remaining_today": self.remaining_today,
+            "tokens": round(self.tokens, 2),
+            "denied": self.denied,
+        }
+
+
+def stretch_factor(tokens: float, capacity: float) -> float:
+    """剩余令牌为 tokens、容量为 capacity 时刷新间隔的放大倍数"""
+    fill = tokens / capacity if capacity else 0
+    if fill >= 0.5:
+        return 1.0
+    return min(MAX_STRETCH, 0.5 / max(fill, 0.01))
+
+
+def async_get_budget(hass: HomeAssistant, key: str, daily_quota: int) -> QWeatherBudget:
+    """获取某个 key 的请求额度，使用同一 key 的 hub 共享额度"""
+    budgets: dict[str, QWeatherBudget] = hass.data.setdefault(DATA_BUDGETS, {})
+    if (budget := budgets.get(key)) is None:
+        budget = budgets[key] = QWeatherBudget(daily_quota)
+    elif budget.daily_quota != daily_quota:
+        _LOGGER.debug("Daily quota of a shared key changed to %d", daily_quota)
+        budget.daily_quota = daily_quota
+    return budget
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from http import HTTPStatus
+from typing import Any
+
+from aiohttp import ClientSession, hdrs
+
+from homeassistant.core import HomeAssistant
+
+from .budget import QWeatherBudget, QWeatherBudgetExceeded
+from .const import DOMAIN
+from .decoder import QWeatherDecodeError, async_loads
+from .metrics import QWeatherRequestMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_REQUEST_CACHE = f"{DOMAIN}_request_cache"
+
+
+def is_success(data: dict[str, Any]) -> bool:
+    """请求出错时和风天气仍返回 200，错误码在响应体的 code 中"""
+    return data.get("code") in (None, "200")
+
+
+class QWeatherCacheEntry:
+    """某个请求最近一次的结果及其 HTTP 校验信息"""
+
+    __slots__ = ("data", "fetched_at", "etag", "last_modified")
+
+    def __init__(self) -> None:
+        self.data: dict[str, Any] | None = None
+        self.fetched_at: float = 0
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+
+    @property
+    def request_headers(self) -> dict[str, str]:
+        """条件请求头"""
+        headers = {}
+        if self.data is None:
+            return headers
+        if self.etag is not None:
+            headers[hdrs.IF_NONE_MATCH] = self.etag
+        if self.last_modified is not None:
+            headers[hdrs.IF_MODIFIED_SINCE] = self.last_modified
+        return headers
+
+
+class QWeatherRequestCache:
+    """集成范围的请求合并层
+
+    相同的请求（位置、数据类型都相同，即 cache_key 相同）同一时间只会发出一次，
+    TTL 内的结果直接返回给后来的调用者。只有成功的响应会被缓存或共享给使用其他 key 的调用者，
+    错误码通常只与发出请求的 key 有关。
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, QWeatherCacheEntry] = {}
+        # 进行中的请求及发起它的 requester
+        self._inflight: dict[
+            str, tuple[asyncio.Future[tuple[dict[str, Any], str | None]], str | None]] = {}
+        self.fetches: int = 0
+        self.hits: int = 0
+        self.coalesced: int = 0
+
+    async def async_get(
+        self,
+        session: ClientSession,
+        url: str,
+        ttl: float,
+        budget: QWeatherBudget | None = None,
+        priority: int = 0,
+        metrics: QWeatherRequestMetrics | None = None,
+        cache_key: str | None = None,
+        requester: str | None = None,
+    ) -> tuple[dict[str, Any], str | None]:
+        """获取 url 的 json 数据及发出该请求的 requester，网络错误直接抛出
+
+        HTTP 状态表示出错且响应中没有和风天气的错误码时抛出 ClientResponseError，
+        响应不是 json 对象时抛出 QWeatherDecodeError。
+
+        只有真正发出的请求才会消耗 budget 中的额度，额度不足时抛出 QWeatherBudgetExceeded。
+        缓存命中、合并请求以及响应大小和解析耗时记录在 metrics 中。
+        cache_key 默认为 url，使用不同 key 的相同请求可以指定同一个 cache_key 共享结果，
+        requester 标识调用者使用的 key。缓存命中时返回的 requester 为 None；
+        合并到其他 requester 的请求而该请求出错或额度不足时，使用调用者自己的 url 和 budget 重新请求。
+        """
+        if cache_key is None:
+            cache_key = url
+        entry = self._entries.get(cache_key)
+        if (
+            entry is not None
+            and entry.data is not None
+            and time.monotonic() - entry.fetched_at < ttl
+        ):
+            self.hits += 1
+            if metrics is not None:
+                metrics.cache_hits += 1
+            return entry.data, None
+
+        if cache_key in self._inflight:
+            inflight, started_by = self._inflight[cache_key]
+            self.coalesced += 1
+            if metrics is not None:
+                metrics.coalesced += 1
+        else:
+            inflight = asyncio.ensure_future(self._async_fetch(
+                session, url, cache_key, budget, priority, metrics, requester))
+            started_by = requester
+            self._inflight[cache_key] = (inflight, started_by)
+            inflight.add_done_callback(
+                lambda _: self._inflight.pop(cache_key, None))
+
+        # 某个调用者被取消时，不影响其他等待同一请求的调用者
+        try:
+            data, fetched_by = await asyncio.shield(inflight)
+        except QWeatherBudgetExceeded:
+            # 发起请求的 key 额度不足，不代表调用者自己的 key 额度不足
+            if started_by == requester:
+                raise
+            return await self._async_fetch(
+                session, url, cache_key, budget, priority, metrics, requester)
+        if fetched_by != requester and not is_success(data):
+            return await self._async_fetch(
+                session, url, cache_key, budget, priority, metrics, requester)
+        return data, fetched_by
+
+    async def _async_fetch(
+        self,
+        session: ClientSession,
+        url: str,
+        cache_key: str,
+        budget: QWeatherBudget | None,
+        priority: int,
+        metrics: QWeatherRequestMetrics | None,
+        requester: str | None,
+    ) -> tuple[dict[str, Any], str | None]:
+        if budget is not None and not budget.try_acquire(priority):
+            raise QWeatherBudgetExceeded
+
+        entry = self._entries.setdefault(cache_key, QWeatherCacheEntry())
+        self.fetches += 1
+
+        async with session.get(url, headers=entry.request_headers) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED and entry.data is not None:
+                entry.fetched_at = time.monotonic()
+                return entry.data, requester
+
+            body = await response.read()
+            etag = response.headers.get(hdrs.ETAG)
+            last_modified = response.headers.get(hdrs.LAST_MODIFIED)
+
+        # 连接已归还连接池，再解析响应
+        decode_started = time.perf_counter()
+        try:
+            data = await async_loads(body)
+        except QWeatherDecodeError:
+            # 网关等返回的错误页面不是 json，优先以 HTTP 状态报告错误
+            response.raise_for_status()
+            raise
+        if not isinstance(data, dict) or (not response.ok and "code" not in data):
+            response.raise_for_status()
+            raise QWeatherDecodeError("Response is not a json object")
+        if metrics is not None:
+            metrics.record_fetch(len(body), time.perf_counter() - decode_started)
+        if is_success(data):
+            entry.data = data
+            entry.etag = etag
+            entry.last_modified = last_modified
+            entry.fetched_at = time.monotonic()
+        return data, requester
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+        }
+
+
+def async_get_request_cache(hass: HomeAssistant) -> QWeatherRequestCache:
+    """获取集成共享的请求合并层"""
+    return hass.data.setdefault(DATA_REQUEST_CACHE, QWeatherRequestCache())
@@ -3,25 +3,62 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import CONF_LATITUDE, CONF_LONGITUDE
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
 from homeassistant.helpers import selector
 
 from .const import (
+    CONF_CACHE_TTL,
+    CONF_DAILY_HORIZON,
+    CONF_DAILY_QUOTA,
+    CONF_HOURLY_HORIZON,
     CONF_KEY,
     CONF_LOCATION,
     CONF_LOCATION_NAME,
+    CONF_RECORD_TRAFFIC,
+    DAILY_HORIZONS,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_DAILY_QUOTA,
     DOMAIN,
+    HOURLY_HORIZONS,
 )
+from .hub import async_get_location_index, parse_locations
+from .keys import parse_keys
+from .locations import QWeatherLocationIndex
 
 _LOGGER = logging.getLogger(__name__)
 
+CONF_SEARCH = "search"
+# 每次搜索在选择列表中列出的位置数
+SEARCH_LIMIT = 20
+
+
+def search_locations(
+    index: QWeatherLocationIndex, query: str, limit: int = SEARCH_LIMIT
+) -> dict[str, str]:
+    """按名称、拼音、ID 或 "纬度 经度" 搜索位置，返回 ID 到名称的映射"""
+    parts = query.replace("，", " ").split()
+    if len(parts) == 2:
+        try:
+            latitude, longitude = (float(part) for part in parts)
+        except ValueError:
+            pass
+        else:
+            return {
+                location.id: f"{location.label} {distance:.0f} km"
+                for location, distance in index.nearest(latitude, longitude, limit)
+            }
+    return {location.id: location.label for location in index.search(query, limit)}
+
 
 class QWeatherConfigFlow(ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         self._data: dict[str, Any] = {}
         self._entry: ConfigEntry | None = None
+        self._user_input: dict[str, Any] = {}
+        self._choices: dict[str, str] = {}
 
     @staticmethod
     @callback
@@ -40,31 +77,36 @@ class QWeatherConfigFlow(ConfigFlow, domain=DOMAIN):
             data.update(user_input)
             if len(data[CONF_LOCATION_NAME]) < 1:
                 errors[CONF_LOCATION_NAME] = "invalid_name"
-            if len(data[CONF_KEY]) != 32:
+            keys = parse_keys(data[CONF_KEY])
+            if not keys or any(len(key) != 32 for key in keys):
                 errors[CONF_KEY] = "invalid_key"
-            if not str(data[CONF_LOCATION]).isdigit():
+            locations = parse_locations(data[CONF_LOCATION])
+            index = await async_get_location_index(self.hass)
+            if not locations:
                 errors[CONF_LOCATION] = "invalid_location"
+            elif index is None:
+                if not all(location.isdigit() for location in locations):
+                    errors[CONF_LOCATION] = "invalid_location"
+            elif any(location.isdigit() and index.get(location) is None
+                     for location in locations):
+                errors[CONF_LOCATION] = "unknown_location"
+            elif not all(location.isdigit() for location in locations):
+                # 输入了名称、拼音或坐标，到下一步从搜索结果中选择
+                self._user_input = user_input
+                self._choices = {
+                    location: index.get(location).label
+                    for location in locations if location.isdigit()
+                }
+                for query in locations:
+                    if not query.isdigit():
+                        self._choices.update(search_locations(index, query))
+                if len(self._choices) > len(
+                        [location for location in locations if location.isdigit()]):
+                    return await self.async_step_location()
+                errors[CONF_LOCATION] = "no_match"
 
             if not errors:
-                if self._entry:
-                    self.hass.config_entries.async_update_entry(
-                        self._entry, data=data)
-                    self.hass.async_create_task(
-                        self.hass.config_entries.async_reload(
-                            self._entry.entry_id)
-                    )
-                    return self.async_abort(reason="reauth_successful")
-
-                self._async_abort_entries_match(
-                    {CONF_LOCATION_NAME: user_input[CONF_LOCATION_NAME]}
-                )
-
-                self._data.update(data)
-                return self.async_create_entry(
-                    title=self._data[CONF_LOCATION_NAME],
-                    data=self._data,
-                    options=user_input,
-                )
+                return self._async_finish(user_input)
 
         if self._entry:
             data.update(self._entry.data)
@@ -91,6 +133,76 @@ class QWeatherConfigFlow(ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_location(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """从离线索引的搜索结果中选择位置，可以继续搜索追加候选"""
+        errors = {}
+        selected = [
+            location for location in parse_locations(self._user_input[CONF_LOCATION])
+            if location.isdigit()
+        ]
+
+        if user_input is not None:
+            selected = user_input.get(CONF_LOCATION, [])
+            if query := user_input.get(CONF_SEARCH, "").strip():
+                index = await async_get_location_index(self.hass)
+                choices = search_locations(index, query)
+                if not choices:
+                    errors[CONF_SEARCH] = "no_match"
+                self._choices.update(choices)
+            elif not selected:
+                errors[CONF_LOCATION] = "invalid_location"
+            else:
+                return self._async_finish(
+                    {**self._user_input, CONF_LOCATION: ",".join(selected)})
+
+        return self.async_show_form(
+            step_id="location",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(CONF_LOCATION, default=selected): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=[
+                                selector.SelectOptionDict(value=value, label=label)
+                                for value, label in self._choices.items()
+                            ],
+                            multiple=True,
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        )
+                    ),
+                    vol.Optional(CONF_SEARCH): selector.TextSelector(
+                        selector.TextSelectorConfig(
+                            type=selector.TextSelectorType.SEARCH)
+                    ),
+                }
+            ),
+            errors=errors,
+        )
+
+    @callback
+    def _async_finish(self, user_input: dict[str, Any]) -> FlowResult:
+        data = dict(user_input)
+        if self._entry:
+            self.hass.config_entries.async_update_entry(
+                self._entry, data=data)
+            self.hass.async_create_task(
+                self.hass.config_entries.async_reload(
+                    self._entry.entry_id)
+            )
+            return self.async_abort(reason="reauth_successful")
+
+        self._async_abort_entries_match(
+            {CONF_LOCATION_NAME: user_input[CONF_LOCATION_NAME]}
+        )
+
+        self._data.update(data)
+        return self.async_create_entry(
+            title=self._data[CONF_LOCATION_NAME],
+            data=self._data,
+            options=user_input,
+        )
+
 
 class QWeatherOptionFlowHander(OptionsFlow):
     def __init__(self, config_entry: ConfigEntry) -> None:
@@ -103,7 +215,7 @@ class QWeatherOptionFlowHander(OptionsFlow):
 
         if user_input is not None:
             try:
-                if len(user_input[CONF_KEY]) < 1:
+                if not parse_keys(user_input[CONF_KEY]):
                     errors[CONF_KEY] = "setup_key"
                 else:
                     return self.async_create_entry(
@@ -113,3 +225,90 @@ class QWeatherOptionFlowHander(OptionsFlow):
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.error("Unexpected exception", exc_info=True)
                 errors["base"] = "unknown"
+
+        config = {**self._config_entry.data, **self._config_entry.options}
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_KEY, default=config.get(CONF_KEY, "")
+                    ): selector.TextSelector(
+                        selector.TextSelectorConfig(
+                            type=selector.TextSelectorType.PASSWORD
+                        )
+                    ),
+                    vol.Required(
+                        CONF_CACHE_TTL,
+                        default=config.get(CONF_CACHE_TTL, DEFAULT_CACHE_TTL),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0,
+                            max=3600,
+                            unit_of_measurement="s",
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_DAILY_QUOTA,
+                        default=config.get(
+                            CONF_DAILY_QUOTA, DEFAULT_DAILY_QUOTA),
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=1,
+                            max=1000000,
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                    # 预报时长，较长的时长响应更大，只在使用时转换
+                    vol.Required(
+                        CONF_HOURLY_HORIZON,
+                        default=config.get(CONF_HOURLY_HORIZON, HOURLY_HORIZONS[0]),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=list(HOURLY_HORIZONS),
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_DAILY_HORIZON,
+                        default=config.get(CONF_DAILY_HORIZON, DAILY_HORIZONS[0]),
+                    ): selector.SelectSelector(
+                        selector.SelectSelectorConfig(
+                            options=list(DAILY_HORIZONS),
+                            mode=selector.SelectSelectorMode.DROPDOWN,
+                        )
+                    ),
+                    # 录制请求和响应，用于离线回放和容量评估
+                    vol.Required(
+                        CONF_RECORD_TRAFFIC,
+                        default=config.get(CONF_RECORD_TRAFFIC, False),
+                    ): selector.BooleanSelector(),
+                    # 只有一个位置时分钟级降水使用的经纬度，留空时使用位置索引中的坐标或 Home Assistant 的位置
+                    vol.Optional(
+                        CONF_LATITUDE,
+                        description={"suggested_value": config.get(CONF_LATITUDE)},
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=-90,
+                            max=90,
+                            step=0.01,
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_LONGITUDE,
+                        description={"suggested_value": config.get(CONF_LONGITUDE)},
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=-180,
+                            max=180,
+                            step=0.01,
+                            mode=selector.NumberSelectorMode.BOX,
+                        )
+                    ),
+                }
+            ),
+            errors=errors,
+        )
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 DOMAIN = "qweather"
 ISSUE_URL = "https://github.com/VergilGao/qweather/issues"
 
@@ -14,3 +16,47 @@ Version: {INTEGRATION_VERSION}
 CONF_LOCATION_NAME = "location_name"
 CONF_KEY = "key"
 CONF_LOCATION = "location"
+CONF_CACHE_TTL = "cache_ttl"
+CONF_DAILY_QUOTA = "daily_quota"
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_HOURLY_HORIZON = "hourly_horizon"
+CONF_DAILY_HORIZON = "daily_horizon"
+
+DEFAULT_CACHE_TTL = 60
+DEFAULT_DAILY_QUOTA = 1000
+
+# 和风天气提供的逐小时、逐天预报时长，第一项为默认值
+HOURLY_HORIZONS = ("24h", "72h", "168h")
+DAILY_HORIZONS = ("7d", "15d", "30d")
+
+STORAGE_VERSION = 1
+# 磁盘写入的防抖时间，频繁刷新时合并为一次写入
+STORAGE_SAVE_DELAY = 300
+
+# 首次获取数据时每项数据的超时时间（秒）
+FIRST_REFRESH_TIMEOUT = {
+    "now": 20,
+    "hourly": 30,
+    "daily": 30,
+    "air": 20,
+    "indices": 30,
+    "minutely": 20,
+}
+
+# 各项数据的刷新间隔：默认值、最小值、最大值
+REFRESH_INTERVALS = {
+    "now": (timedelta(minutes=10), timedelta(minutes=5), timedelta(minutes=30)),
+    "hourly": (timedelta(minutes=15), timedelta(minutes=10), timedelta(hours=1)),
+    "daily": (timedelta(hours=3), timedelta(hours=1), timedelta(hours=6)),
+    "air": (timedelta(hours=1), timedelta(minutes=30), timedelta(hours=2)),
+    "indices": (timedelta(hours=6), timedelta(hours=3), timedelta(hours=12)),
+    "minutely": (timedelta(minutes=5), timedelta(minutes=5), timedelta(minutes=30)),
+}
+
+# 所有条目同时进行的刷新数上限
+MAX_CONCURRENT_REQUESTS = 4
+# 在此时间窗口内到期的刷新合并为一批执行
+BURST_WINDOW = timedelta(seconds=30)
+
+# 预计即将开始降水时触发的事件
+EVENT_PRECIPITATION_START = f"{DOMAIN}_precipitation_start"
@@ -0,0 +1,36 @@
+import asyncio
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# 超过该大小（字节）的响应在线程池中解析，避免阻塞事件循环
+EXECUTOR_THRESHOLD = 32 * 1024
+
+
+class QWeatherDecodeError(ValueError):
+    """响应不是合法的 json"""
+
+
+def loads(body: bytes) -> Any:
+    """解析 json，安装了 orjson 时使用 orjson"""
+    try:
+        if orjson is not None:
+            return orjson.loads(body)
+        return json.loads(body)
+    except ValueError as err:
+        raise QWeatherDecodeError(str(err)) from err
+
+
+async def async_loads(body: bytes) -> Any:
+    """解析 json，较大的响应在线程池中解析"""
+    if len(body) < EXECUTOR_THRESHOLD:
+        return loads(body)
+    return await asyncio.get_running_loop().run_in_executor(None, loads, body)
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
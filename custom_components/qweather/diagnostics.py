@@ -0,0 +1,52 @@
+import logging
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_KEY, DOMAIN
+from .decoder import backend
+from .hub import QWeatherFleet
+
+_LOGGER = logging.getLogger(__name__)
+
+TO_REDACT = {CONF_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """下载诊断信息，包含每个位置的请求统计"""
+    fleet: QWeatherFleet = hass.data[DOMAIN][entry.entry_id]
+    hubs = fleet.hubs
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "decoder": backend(),
+        "session": hubs[0].session_stats if hubs else {},
+        "request_cache": hubs[0].request_cache_stats if hubs else {},
+        "scheduler": hubs[0].scheduler_stats if hubs else {},
+        "keys": hubs[0].key_stats if hubs else {},
+        "recorder": (
+            {"path": str(fleet.recorder.path), "records": fleet.recorder.records}
+            if fleet.recorder is not None else None
+        ),
+        "locations": {
+            hub.location: {
+                "name": hub.name,
+                "restored": hub.restored,
+                "stale": hub.stale,
+                "demand": hub.demand,
+                "history": len(hub.history),
+                "setup": hub.setup_metrics,
+                "next_refresh": hub.next_refresh,
+                "refresh": hub.refresh_stats,
+                "requests": hub.request_stats,
+            }
+            for hub in hubs
+        },
+    }
@@ -0,0 +1,128 @@
+import logging
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from .const import DAILY_HORIZONS, HOURLY_HORIZONS
+from .model import (AIR_NOW_FIELDS, DAILY_FIELDS, EMPTY_DAILY, EMPTY_HOURLY,
+                    HOURLY_FIELDS, QWeatherMinutely, QWeatherNow,
+                    QWeatherRecord, QWeatherSeries, dump_indices,
+                    parse_indices)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class QWeatherUpdateFeature:
+    """已注册接口的名称"""
+
+    NOW = "now"
+    HOURLY = "hourly"
+    DAILY = "daily"
+    AIR = "air"
+    INDICES = "indices"
+    MINUTELY = "minutely"
+
+
+@dataclass(frozen=True, slots=True)
+class QWeatherEndpoint:
+    """和风天气的一个接口
+
+    客户端、请求合并层与调度器以相同的方式处理所有接口，新增接口只需在 ENDPOINTS 中登记。
+    """
+
+    name: str
+    path: str  # 相对于 API_URL 的路径
+    data_key: str | None  # 响应中数据所在的键，为 None 时使用整个响应
+    ttl: float  # 请求合并层中结果的有效期（秒），条目设置的 cache_ttl 只能缩短它
+    parse: Callable[[Any], Any]  # 将响应数据转换为内存中的结构
+    dump: Callable[[Any], Any]  # 转换为可以持久化的结构，parse 可以还原
+    empty: Any = None  # 尚未获取数据时的值
+    params: Mapping[str, str] = field(default_factory=dict)  # 额外的查询参数
+    priority: tuple[int, int] = (0, 0)  # 额度紧张时的优先级：平时、临近午夜
+    volatile: bool = False  # 天气剧变时是否加快刷新
+    merge: Callable[[Any, Any], Any] | None = None  # 将新数据合并到已有的结构中，代替 parse
+    coordinates: bool = False  # 以经纬度而不是位置 ID 查询
+    budget_aware: bool = False  # 额度紧张时放宽刷新间隔
+    diff_key: str | None = None  # 预报序列按该字段对齐比较，没有变化时不通知监听器
+    horizons: tuple[str, ...] = ()  # 可选的预报时长，替换 path 的最后一段
+
+    def path_for(self, horizon: str | None = None) -> str:
+        """预报时长为 horizon 时的路径，未设置或不支持的时长使用默认路径"""
+        if horizon is None or horizon not in self.horizons:
+            return self.path
+        return f"{self.path.rsplit('/', 1)[0]}/{horizon}"
+
+
+ENDPOINTS: dict[str, QWeatherEndpoint] = {
+    endpoint.name: endpoint
+    for endpoint in (
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.NOW,
+            path="weather/now",
+            data_key="now",
+            ttl=60,
+            parse=QWeatherNow,
+            dump=QWeatherNow.as_dict,
+            priority=(0, 2),
+            volatile=True,
+        ),
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.HOURLY,
+            path="weather/24h",
+            data_key="hourly",
+            ttl=60,
+            parse=partial(QWeatherSeries, HOURLY_FIELDS),
+            dump=QWeatherSeries.as_list,
+            empty=EMPTY_HOURLY,
+            diff_key="fxTime",
+            horizons=HOURLY_HORIZONS,
+            priority=(1, 1),
+            volatile=True,
+        ),
+        # 临近午夜时逐天预报会发布新一天的数据，优先级反转
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.DAILY,
+            path="weather/7d",
+            data_key="daily",
+            ttl=60,
+            parse=partial(QWeatherSeries, DAILY_FIELDS),
+            dump=QWeatherSeries.as_list,
+            empty=EMPTY_DAILY,
+            diff_key="fxDate",
+            horizons=DAILY_HORIZONS,
+            priority=(2, 0),
+        ),
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.AIR,
+            path="air/now",
+            data_key="now",
+            ttl=300,
+            parse=partial(QWeatherRecord, AIR_NOW_FIELDS),
+            dump=QWeatherRecord.as_dict,
+            priority=(2, 2),
+        ),
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.INDICES,
+            path="indices/1d",
+            data_key="daily",
+            ttl=1800,
+            parse=parse_indices,
+            dump=dump_indices,
+            params={"type": "0"},
+            priority=(3, 3),
+        ),
+        QWeatherEndpoint(
+            name=QWeatherUpdateFeature.MINUTELY,
+            path="minutely/5m",
+            data_key=None,
+            ttl=60,
+            parse=QWeatherMinutely,
+            dump=QWeatherMinutely.as_dict,
+            merge=QWeatherMinutely.merge,
+            priority=(1, 1),
+            coordinates=True,
+            budget_aware=True,
+        ),
+    )
+}
@@ -0,0 +1,157 @@
+import logging
+import math
+from array import array
+from collections import deque
+from datetime import timedelta
+from typing import Any
+
+from .model import QWeatherNow
+
+_LOGGER = logging.getLogger(__name__)
+
+# 保留历史的数值字段
+HISTORY_FIELDS: tuple[str, ...] = (
+    "temp", "feelsLike", "dew", "humidity", "pressure", "windSpeed")
+# 环形缓冲区的槽数与保留时长，实时天气约 10 分钟更新一次，24 小时约 144 次观测
+HISTORY_SLOTS = 160
+HISTORY_SPAN = timedelta(hours=24)
+# 计算变化量的时间窗口，最后一个窗口同时用于计算变化速率和趋势
+TREND_WINDOWS: tuple[timedelta, ...] = (timedelta(hours=1), timedelta(hours=3))
+# 每小时变化超过该值视为上升或下降，未列出的字段使用 DEFAULT_TREND_THRESHOLD
+TREND_THRESHOLDS: dict[str, float] = {
+    "pressure": 0.5,
+    "humidity": 2,
+}
+DEFAULT_TREND_THRESHOLD = 0.5
+
+
+def _number(value: float) -> float | None:
+    return None if value != value else round(value, 2)
+
+
+class QWeatherHistory:
+    """最近的实时天气观测
+
+    定长环形缓冲区，每个观测以递增的序号定位，槽位为序号对容量取模，内存占用固定。
+    最小值和最大值由单调队列维护，各时间窗口的起点由只前进的游标维护，
+    每次追加和读取的开销均摊为常数。
+    """
+
+    def __init__(
+        self,
+        fields: tuple[str, ...] = HISTORY_FIELDS,
+        capacity: int = HISTORY_SLOTS,
+        span: timedelta = HISTORY_SPAN,
+    ) -> None:
+        self.capacity: int = capacity
+        self._span: float = span.total_seconds()
+        self.times: array = array("d", [math.nan]) * capacity
+        self.columns: dict[str, array] = {
+            field: array("d", [math.nan]) * capacity for field in fields
+        }
+        # 有效的观测为序号在 [tail, head) 内的观测
+        self.head: int = 0
+        self.tail: int = 0
+        self._minimums: dict[str, deque[int]] = {field: deque() for field in fields}
+        self._maximums: dict[str, deque[int]] = {field: deque() for field in fields}
+        self._cursors: dict[float, int] = {
+            window.total_seconds(): 0 for window in TREND_WINDOWS
+        }
+
+    def __len__(self) -> int:
+        return self.head - self.tail
+
+    def append(self, now: QWeatherNow | None) -> bool:
+        """追加一次观测，观测时间不晚于最近一次观测时忽略"""
+        if now is None or now.obsTime is None:
+            return False
+
+        timestamp = now.obsTime.timestamp()
+        if len(self) and timestamp <= self.times[(self.head - 1) % self.capacity]:
+            return False
+
+        if len(self) == self.capacity:
+            self._evict()
+
+        seq = self.head
+        slot = seq % self.capacity
+        self.times[slot] = timestamp
+        for field, column in self.columns.items():
+            value = now.get(field)
+            if value is None:
+                column[slot] = math.nan
+                continue
+
+            column[slot] = value
+            minimums = self._minimums[field]
+            while minimums and column[minimums[-1] % self.capacity] >= value:
+                minimums.pop()
+            minimums.append(seq)
+            maximums = self._maximums[field]
+            while maximums and column[maximums[-1] % self.capacity] <= value:
+                maximums.pop()
+            maximums.append(seq)
+        self.head += 1
+
+        while self.times[self.tail % self.capacity] < timestamp - self._span:
+            self._evict()
+        return True
+
+    def _evict(self) -> None:
+        seq = self.tail
+        self.tail += 1
+        for queues in (self._minimums, self._maximums):
+            for queue in queues.values():
+                if queue and queue[0] == seq:
+                    queue.popleft()
+
+    def _lagged(self, window: float) -> int | None:
+        """最近一次观测之前 window 秒或更早的最后一个观测的序号"""
+        target = self.times[(self.head - 1) % self.capacity] - window
+        cursor = max(self._cursors[window], self.tail)
+        while cursor + 1 < self.head and self.times[(cursor + 1) % self.capacity] <= target:
+            cursor += 1
+        self._cursors[window] = cursor
+        return cursor if self.times[cursor % self.capacity] <= target else None
+
+    def stats(self, field: str) -> dict[str, Any]:
+        """某个字段的变化量、变化速率（每小时）、趋势及保留时长内的最小值和最大值"""
+        if not len(self):
+            return {}
+
+        column = self.columns[field]
+        latest_slot = (self.head - 1) % self.capacity
+        latest = column[latest_slot]
+        span_hours = round(self._span / 3600)
+        result: dict[str, Any] = {}
+
+        rate = None
+        for window in self._cursors:
+            seq = self._lagged(window)
+            change = math.nan if seq is None else latest - column[seq % self.capacity]
+            result[f"change_{round(window / 3600)}h"] = _number(change)
+            if seq is not None and change == change:
+                elapsed = self.times[latest_slot] - self.times[seq % self.capacity]
+                rate = change / (elapsed / 3600)
+
+        threshold = TREND_THRESHOLDS.get(field, DEFAULT_TREND_THRESHOLD)
+        if rate is None:
+            trend = None
+        elif rate >= threshold:
+            trend = "rising"
+        elif rate <= -threshold:
+            trend = "falling"
+        else:
+            trend = "steady"
+
+        minimums = self._minimums[field]
+        maximums = self._maximums[field]
+        result.update({
+            "rate": None if rate is None else round(rate, 2),
+            "trend": trend,
+            f"min_{span_hours}h": (
+                _number(column[minimums[0] % self.capacity]) if minimums else None),
+            f"max_{span_hours}h": (
+                _number(column[maximums[0] % self.capacity]) if maximums else None),
+        })
+        return result
@@ -1,63 +1,495 @@
+import asyncio
 import logging
+import time
+from collections.abc import Callable, Iterable, Mapping
 from datetime import timedelta
-from collections.abc import Mapping
+from functools import partial
+from pathlib import Path
 from typing import Any
 
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_LATITUDE, CONF_LONGITUDE
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+from homeassistant.util import dt as dt_util
 
-from .const import CONF_KEY, CONF_LOCATION, CONF_LOCATION_NAME
-from .api import QWeatherClient, QWeatherData, QWeatherUpdateFeature
+from .const import (CONF_CACHE_TTL, CONF_DAILY_HORIZON, CONF_DAILY_QUOTA,
+                    CONF_HOURLY_HORIZON, CONF_KEY, CONF_LOCATION,
+                    CONF_LOCATION_NAME, CONF_RECORD_TRAFFIC,
+                    DEFAULT_DAILY_QUOTA, DOMAIN, EVENT_PRECIPITATION_START,
+                    FIRST_REFRESH_TIMEOUT, REFRESH_INTERVALS,
+                    STORAGE_SAVE_DELAY, STORAGE_VERSION)
+from .api import QWeatherClient, QWeatherData
+from .cache import async_get_request_cache
+from .endpoints import ENDPOINTS, QWeatherUpdateFeature
+from .history import QWeatherHistory
+from .keys import QWeatherKeyPool, async_get_key_pool, parse_keys
+from .locations import QWeatherLocationIndex, load_location_index
+from .metrics import QWeatherRequestMetrics
+from .recorder import QWeatherRecorder
+from .schedule import QWeatherRefreshPolicy, QWeatherVolatility
+from .scheduler import QWeatherScheduler, async_get_scheduler
+from .session import async_get_session
 
 _LOGGER = logging.getLogger(__name__)
 
+DATA_LOCATION_INDEX = f"{DOMAIN}_location_index"
+
+
+async def async_get_location_index(hass: HomeAssistant) -> QWeatherLocationIndex | None:
+    """离线位置索引，首次使用时在线程池中加载，未打包索引时为 None"""
+    if DATA_LOCATION_INDEX not in hass.data:
+        hass.data[DATA_LOCATION_INDEX] = await hass.async_add_executor_job(
+            load_location_index)
+    return hass.data[DATA_LOCATION_INDEX]
+
 
 class QWeatherHub:
     """和风天气 Hub"""
 
-    def __init__(self, hass: HomeAssistant, config: Mapping[str, Any]) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        config: Mapping[str, Any],
+        location: str,
+        name: str,
+        scheduler: QWeatherScheduler,
+        recorder: QWeatherRecorder | None = None,
+        coordinates: str | None = None,
+    ) -> None:
         self._hass_config: Mapping[str, Any] = config
         self._hass: HomeAssistant = hass
+        self._scheduler: QWeatherScheduler = scheduler
+        self._store: Store = Store(
+            hass, STORAGE_VERSION, storage_key(entry_id, location))
+        self._restored: bool = False
+        # 是否有尚未写入磁盘的数据
+        self._unsaved: bool = False
+        self._setup_metrics: dict[str, float | None] = {}
+        self._listeners: list[tuple[Callable[[str], None], frozenset[str]]] = []
+        # 每项数据被多少个监听器使用，只有被使用的数据才会被获取
+        self._demand: dict[str, int] = {}
+        self._started: bool = False
+        self._policies: dict[str, QWeatherRefreshPolicy] = {
+            name: QWeatherRefreshPolicy(*REFRESH_INTERVALS[name])
+            for name in ENDPOINTS
+        }
+        self._volatility = QWeatherVolatility()
+        self._history = QWeatherHistory()
+        self._precipitation_expected: bool = False
 
-        key = config[CONF_KEY]
-        location = config[CONF_LOCATION]
-        self._name = config[CONF_LOCATION_NAME]
+        keys = parse_keys(config[CONF_KEY])
+        self._location = location
+        self._name = name
 
-        if not key:
+        if not keys:
             _LOGGER.error("未设置 key")
 
         if not location:
             _LOGGER.error("未设置坐标")
 
+        self._keys: QWeatherKeyPool = async_get_key_pool(
+            hass, keys, int(config.get(CONF_DAILY_QUOTA, DEFAULT_DAILY_QUOTA)))
+
         self._client: QWeatherClient = QWeatherClient(
-            key, location)
+            self._keys,
+            location,
+            async_get_request_cache(hass),
+            config.get(CONF_CACHE_TTL),
+            coordinates,
+            {
+                QWeatherUpdateFeature.HOURLY: config.get(CONF_HOURLY_HORIZON),
+                QWeatherUpdateFeature.DAILY: config.get(CONF_DAILY_HORIZON),
+            },
+        )
+        self._client.recorder = recorder
 
     async def asnyc_setup(self) -> None:
         """初始化 hub"""
+        started = time.monotonic()
         try:
             await self.teardown()
+            self._client.session = async_get_session(self._hass).acquire()
+            self._scheduler.register(self)
+
+            if stored := await self._store.async_load():
+                self._client.restore(stored)
+                self._history.append(self.weather.now)
+                self._restored = True
 
         except Exception as exeption:
             msg = "Error during setup"
             _LOGGER.error(msg, exc_info=True)
             raise ConfigEntryNotReady(msg) from exeption
 
+        self._setup_metrics["setup"] = time.monotonic() - started
+
     async def teardown(self) -> None:
-        """释放 hub 的占用的资源"""
+        """释放 hub 的占用的资源，立即写入尚未保存的数据"""
+        self._started = False
+        self._scheduler.unregister(self)
+
+        # 写入同时取消延迟的写入，避免卸载后旧的 Store 再次创建文件或覆盖新数据
+        if self._unsaved:
+            self._unsaved = False
+            await self._store.async_save(self._client.as_storage())
+
+        if self._client.session is not None:
+            self._client.session = None
+            await async_get_session(self._hass).release()
+
+    async def _async_update(self, feature: str) -> bool:
+        generation = self.weather.generation(feature)
+        changed = await self._client.async_update_weather(feature)
+
+        # 发布时间是否变化由刷新策略自行比较，内容相同的重新发布同样计入发布节奏
+        update_time = self._client.state(feature).update_time
+        self._policies[feature].record(
+            dt_util.parse_datetime(update_time) if update_time else None)
+        if not changed:
+            return False
+
+        if self.weather.generation(feature) == generation:
+            # 只有过期标记被清除，数据本身没有变化，只需更新实体状态
+            self._async_notify_listeners(feature)
+            return True
+
+        if feature == QWeatherUpdateFeature.NOW:
+            self._volatility.observe(self.weather.now)
+            self._history.append(self.weather.now)
+        elif feature == QWeatherUpdateFeature.MINUTELY:
+            self._async_check_precipitation()
+
+        self._unsaved = True
+        self._store.async_delay_save(
+            self._client.as_storage, STORAGE_SAVE_DELAY)
+        self._async_notify_listeners(feature)
+        return True
+
+    @callback
+    def _async_check_precipitation(self) -> None:
+        """预计的降水从无到有时触发事件"""
+        onset = self.weather.minutely.next_precipitation(dt_util.utcnow())
+        expected, self._precipitation_expected = self._precipitation_expected, onset is not None
+        if onset is None or expected:
+            return
+
+        start, kind = onset
+        self._hass.bus.async_fire(
+            EVENT_PRECIPITATION_START,
+            {
+                "name": self._name,
+                "location": self._location,
+                "start": start.isoformat(),
+                "minutes": max(0, round((start - dt_util.utcnow()).total_seconds() / 60)),
+                "type": kind,
+                "summary": self.weather.minutely.summary,
+            },
+        )
+
+    @callback
+    def _async_schedule_refresh(self, feature: str) -> None:
+        """按照刷新策略安排某项数据的下次刷新，不再被使用的数据不再刷新"""
+        if not self._demand.get(feature):
+            return
+
+        volatile = (
+            ENDPOINTS[feature].volatile
+            and self._volatility.is_volatile(self.weather)
+        )
+        policy = self._policies[feature]
+        delay = policy.next_delay(dt_util.utcnow(), volatile)
+        if ENDPOINTS[feature].budget_aware:
+            delay = min(delay * self._keys.stretch, max(delay, policy.maximum))
+        self._scheduler.schedule(
+            self, feature, delay, partial(self._async_scheduled_refresh, feature))
+
+    async def _async_scheduled_refresh(self, feature: str) -> None:
+        try:
+            await self._async_update(feature)
+        finally:
+            self._async_schedule_refresh(feature)
+
+    @callback
+    def async_add_listener(
+        self, update_callback: Callable[[str], None], features: Iterable[str]
+    ) -> Callable[[], None]:
+        """注册监听器及其使用的数据，返回取消注册的函数
+
+        首次被使用的数据在首次刷新之后注册时立即安排获取。
+        """
+        listener = (update_callback, frozenset(features))
+        self._listeners.append(listener)
+        for feature in listener[1]:
+            self._demand[feature] = self._demand.get(feature, 0) + 1
+            if self._demand[feature] == 1 and self._started:
+                self._scheduler.schedule(
+                    self, feature, timedelta(0),
+                    partial(self._async_scheduled_refresh, feature))
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(listener)
+            for feature in listener[1]:
+                self._demand[feature] -= 1
+                if not self._demand[feature]:
+                    del self._demand[feature]
+                    self._scheduler.cancel(self, feature)
+
+        return remove_listener
+
+    @callback
+    def _async_notify_listeners(self, feature: str) -> None:
+        for update_callback, features in list(self._listeners):
+            if feature in features:
+                update_callback(feature)
+
+    async def async_first_refresh(self) -> None:
+        """首次并发获取所有被使用的数据，每项数据到达后立即通知监听器"""
+        started = time.monotonic()
+        self._started = True
+
+        async def _async_refresh(feature: str) -> None:
+            try:
+                async with self._scheduler.limit:
+                    await asyncio.wait_for(
+                        self._async_update(feature), FIRST_REFRESH_TIMEOUT[feature])
+            except asyncio.TimeoutError:
+                _LOGGER.warning(
+                    "First refresh of %s for %s timed out", feature, self._name)
+                self._setup_metrics[feature] = None
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception(
+                    "Error during first refresh of %s for %s", feature, self._name)
+                self._setup_metrics[feature] = None
+            else:
+                self._setup_metrics[feature] = time.monotonic() - started
+            finally:
+                # 首次获取失败的数据同样按刷新策略重试
+                self._async_schedule_refresh(feature)
+
+        await asyncio.gather(*(_async_refresh(feature) for feature in list(self._demand)))
+
+        self._setup_metrics["first_refresh"] = time.monotonic() - started
+        _LOGGER.debug("First refresh of %s: %s", self._name, self._setup_metrics)
+
+    async def async_refresh(self, feature: str) -> bool:
+        """立即刷新某项数据，不影响已安排的刷新，数据有变化时返回 True"""
+        return await self._async_update(feature)
 
     async def async_update_weather_now(self) -> None:
-        await self._client.async_update_weather(QWeatherUpdateFeature.NOW)
+        await self._async_update(QWeatherUpdateFeature.NOW)
 
     async def async_update_weather_hourly(self) -> None:
-        await self._client.async_update_weather(QWeatherUpdateFeature.HOURLY)
+        await self._async_update(QWeatherUpdateFeature.HOURLY)
 
     async def async_update_weather_daily(self) -> None:
-        await self._client.async_update_weather(QWeatherUpdateFeature.DAILY)
+        await self._async_update(QWeatherUpdateFeature.DAILY)
+
+    def supports(self, feature: str) -> bool:
+        """某项数据是否可以获取，没有坐标的位置不提供分钟级降水"""
+        return self._client.supports(feature)
 
     @property
     def name(self) -> str:
         return self._name
 
+    @property
+    def location(self) -> str:
+        return self._location
+
+    @property
+    def restored(self) -> bool:
+        """是否从磁盘缓存恢复了数据"""
+        return self._restored
+
+    @property
+    def next_refresh(self) -> dict[str, dict[str, Any]]:
+        """各项数据的刷新策略状态"""
+        return {
+            feature: {
+                "cadence": policy.cadence.total_seconds(),
+                "repeats": policy.repeats,
+            }
+            for feature, policy in self._policies.items()
+            if feature in self._demand
+        }
+
+    @property
+    def scheduler_stats(self) -> dict[str, int]:
+        return self._scheduler.stats
+
+    @property
+    def setup_metrics(self) -> dict[str, float | None]:
+        """初始化耗时（秒），每项数据为首次获取完成时距开始的时间"""
+        return self._setup_metrics
+
+    @property
+    def stale(self) -> bool:
+        """被使用的数据中是否仍有未被确认的过期数据"""
+        return any(self._client.state(feature).stale for feature in self._demand)
+
+    @property
+    def demand(self) -> dict[str, int]:
+        """每项数据的使用者数量"""
+        return dict(self._demand)
+
+    @property
+    def refresh_stats(self) -> dict[str, dict[str, Any]]:
+        return self._client.refresh_stats
+
+    @property
+    def request_stats(self) -> dict[str, dict[str, Any]]:
+        return self._client.request_stats
+
+    def request_metrics(self, feature: str) -> QWeatherRequestMetrics:
+        return self._client.state(feature).metrics
+
+    @property
+    def session_stats(self) -> dict[str, int | float]:
+        return async_get_session(self._hass).stats
+
+    @property
+    def key_stats(self) -> dict[str, dict[str, Any]]:
+        """各个 key 的使用情况、冷却状态和剩余请求额度"""
+        return self._keys.stats
+
+    @property
+    def request_cache_stats(self) -> dict[str, int]:
+        return async_get_request_cache(self._hass).stats
+
     @property
     def weather(self) -> QWeatherData:
         return self._client.weather
+
+    @property
+    def history(self) -> QWeatherHistory:
+        """最近的实时天气观测"""
+        return self._history
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """每个位置一个设备"""
+        return DeviceInfo(
+            name=f"{self._name} 天气预报",
+            entry_type=DeviceEntryType.SERVICE,
+            identifiers={(DOMAIN, self._location)},
+            manufacturer="和风天气",
+            model="Forecast",
+            configuration_url="https://console.qweather.com/#/console",
+        )
+
+
+class QWeatherFleet:
+    """一个配置条目下使用同一组 key 的所有位置
+
+    每个位置由各自的 QWeatherHub 管理，刷新由集成共享的调度器统一安排。
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, config: Mapping[str, Any]
+    ) -> None:
+        self._hass = hass
+        self._entry_id = entry_id
+        self._config = config
+        self._scheduler = async_get_scheduler(hass)
+        self._recorder: QWeatherRecorder | None = None
+        if config.get(CONF_RECORD_TRAFFIC):
+            self._recorder = QWeatherRecorder(
+                hass, Path(hass.config.path(STORAGE_DIR, traffic_log_name(entry_id))))
+
+        self._locations = parse_locations(config[CONF_LOCATION])
+        if not self._locations:
+            _LOGGER.error("未设置坐标")
+
+        self._hubs: list[QWeatherHub] = []
+
+    async def asnyc_setup(self) -> None:
+        """按位置索引中的坐标创建并初始化所有位置的 hub"""
+        index = await async_get_location_index(self._hass)
+        name = self._config[CONF_LOCATION_NAME]
+        single = len(self._locations) == 1
+        self._hubs = [
+            QWeatherHub(
+                self._hass,
+                self._entry_id,
+                self._config,
+                location,
+                name if single else f"{name}-{location}",
+                self._scheduler,
+                self._recorder,
+                coordinates(self._hass, self._config, location, index, single),
+            )
+            for location in self._locations
+        ]
+        results = await asyncio.gather(
+            *(hub.asnyc_setup() for hub in self._hubs), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # 释放所有 hub 已占用的调度器和连接池，包括初始化到一半出错的 hub，
+            # Home Assistant 重试时重新创建
+            await self.teardown()
+            self._hubs = []
+            raise errors[0]
+
+    async def teardown(self) -> None:
+        """释放所有位置占用的资源，取消它们安排的所有刷新"""
+        await asyncio.gather(*(hub.teardown() for hub in self._hubs))
+        if self._recorder is not None:
+            await self._recorder.async_flush()
+
+    async def async_first_refresh(self) -> None:
+        await asyncio.gather(*(hub.async_first_refresh() for hub in self._hubs))
+
+    @property
+    def hubs(self) -> list[QWeatherHub]:
+        return self._hubs
+
+    @property
+    def recorder(self) -> QWeatherRecorder | None:
+        return self._recorder
+
+
+def parse_locations(value: str) -> list[str]:
+    """解析以逗号分隔的多个位置"""
+    return [location.strip() for location in str(value).split(",") if location.strip()]
+
+
+def coordinates(
+    hass: HomeAssistant,
+    config: Mapping[str, Any],
+    location: str,
+    index: QWeatherLocationIndex | None,
+    single: bool,
+) -> str | None:
+    """某个位置以经纬度查询的接口使用的坐标
+
+    只有一个位置的条目优先使用选项中设置的坐标，其次使用位置索引中的坐标，
+    最后使用 Home Assistant 的位置；多个位置的条目只使用位置索引中各自的坐标，
+    索引中没有的位置没有坐标。
+    """
+    latitude = longitude = None
+    if single:
+        latitude = config.get(CONF_LATITUDE)
+        longitude = config.get(CONF_LONGITUDE)
+    if (latitude is None or longitude is None) and index is not None:
+        if (found := index.get(location)) is not None:
+            latitude, longitude = found.latitude, found.longitude
+    if (latitude is None or longitude is None) and single:
+        latitude, longitude = hass.config.latitude, hass.config.longitude
+    if latitude is None or longitude is None:
+        return None
+    # 和风天气的经纬度最多支持两位小数
+    return f"{float(longitude):.2f},{float(latitude):.2f}"
+
+
+def storage_key(entry_id: str, location: str) -> str:
+    return f"{DOMAIN}.{entry_id}.{location}"
+
+
+def traffic_log_name(entry_id: str) -> str:
+    """录制的请求日志的文件名，位于 .storage 目录"""
+    return f"{DOMAIN}.{entry_id}.traffic.jsonl.gz"
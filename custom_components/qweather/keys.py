@@ -0,0 +1,178 @@
+import logging
+import random
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .budget import MAX_STRETCH, QWeatherBudget, async_get_budget, stretch_factor
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_KEYS = f"{DOMAIN}_keys"
+
+# 返回这些错误码的 key 暂时移出轮换（秒）：
+# 401 认证失败，402 超过额度或余额不足，429 请求过于频繁
+COOLDOWN_CODES: dict[str, float] = {
+    "401": 3600,
+    "402": 3600,
+    "429": 60,
+}
+# 这些错误码只让 key 对出错的接口冷却（秒）：
+# 403 无访问权限，通常是订阅不包含该接口，例如较长的预报时长或分钟级降水
+ENDPOINT_COOLDOWN_CODES: dict[str, float] = {
+    "403": 3600,
+}
+# 连续出错时冷却时间逐次翻倍，最长一天
+MAX_COOLDOWN = 86400
+
+
+def parse_keys(value: str) -> list[str]:
+    """解析以逗号分隔的多个 key，去掉重复的 key"""
+    return list(dict.fromkeys(
+        key.strip() for key in str(value).split(",") if key.strip()))
+
+
+class QWeatherKey:
+    """某个 API key 的使用情况，使用同一 key 的所有 hub 共享"""
+
+    __slots__ = ("key", "budget", "selected", "successes", "errors",
+                 "cooldowns", "consecutive", "cooldown_until", "last_error",
+                 "endpoint_consecutive", "endpoint_cooldown_until")
+
+    def __init__(self, key: str, budget: QWeatherBudget) -> None:
+        self.key: str = key
+        self.budget: QWeatherBudget = budget
+        self.selected: int = 0
+        self.successes: int = 0
+        self.errors: dict[str, int] = {}
+        self.cooldowns: int = 0
+        self.consecutive: int = 0
+        self.cooldown_until: float = 0
+        self.last_error: str | None = None
+        # 只针对某个接口的冷却，以接口路径为键
+        self.endpoint_consecutive: dict[str, int] = {}
+        self.endpoint_cooldown_until: dict[str, float] = {}
+
+    @property
+    def label(self) -> str:
+        """诊断信息中使用的名称，只保留 key 的末尾几位"""
+        return f"***{self.key[-4:]}"
+
+    def available(self, now: float, endpoint: str | None = None) -> bool:
+        """key 是否可用，指定 endpoint 时同时检查该接口的冷却"""
+        return (
+            now >= self.cooldown_until
+            and self.budget.remaining_today > 0
+            and (endpoint is None or now >= self.endpoint_cooldown_until.get(endpoint, 0))
+        )
+
+    def record_success(self, endpoint: str | None = None) -> None:
+        self.successes += 1
+        self.consecutive = 0
+        if endpoint is not None:
+            self.endpoint_consecutive.pop(endpoint, None)
+
+    def record_error(self, code: str, endpoint: str | None = None) -> float | None:
+        """记录和风天气返回的错误码，需要冷却时返回冷却的秒数"""
+        self.errors[code] = self.errors.get(code, 0) + 1
+        self.last_error = code
+        if endpoint is not None and (base := ENDPOINT_COOLDOWN_CODES.get(code)) is not None:
+            consecutive = self.endpoint_consecutive.get(endpoint, 0)
+            cooldown = min(MAX_COOLDOWN, base * 2 ** consecutive)
+            self.endpoint_consecutive[endpoint] = consecutive + 1
+            self.endpoint_cooldown_until[endpoint] = time.monotonic() + cooldown
+            self.cooldowns += 1
+            return cooldown
+
+        if (base := COOLDOWN_CODES.get(code)) is None:
+            return None
+
+        cooldown = min(MAX_COOLDOWN, base * 2 ** self.consecutive)
+        self.consecutive += 1
+        self.cooldowns += 1
+        self.cooldown_until = time.monotonic() + cooldown
+        return cooldown
+
+    def stats(self, now: float) -> dict[str, Any]:
+        return {
+            "selected": self.selected,
+            "successes": self.successes,
+            "errors": dict(self.errors),
+            "last_error": self.last_error,
+            "cooldowns": self.cooldowns,
+            "cooldown_remaining": round(max(0, self.cooldown_until - now), 1),
+            "endpoint_cooldown_remaining": {
+                endpoint: round(until - now, 1)
+                for endpoint, until in self.endpoint_cooldown_until.items()
+                if until > now
+            },
+            "budget": self.budget.stats,
+        }
+
+
+class QWeatherKeyPool:
+    """一个配置条目可以使用的所有 key
+
+    每次请求按各 key 桶中剩余的令牌数加权随机选择一个 key，
+    返回认证或额度错误的 key 在冷却期间不参与选择，无访问权限的 key 只对出错的接口冷却。
+    """
+
+    def __init__(self, keys: list[QWeatherKey]) -> None:
+        self.keys: list[QWeatherKey] = keys
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def select(
+        self, exclude: set[str] | None = None, endpoint: str | None = None
+    ) -> QWeatherKey | None:
+        """选择一个对 endpoint 可用的 key，全部不可用时返回 None"""
+        now = time.monotonic()
+        candidates = [
+            key for key in self.keys
+            if key.available(now, endpoint) and (not exclude or key.key not in exclude)
+        ]
+        if not candidates:
+            return None
+
+        if len(candidates) == 1:
+            key = candidates[0]
+        else:
+            key = self._random.choices(
+                candidates, [max(key.budget.available, 0.01) for key in candidates])[0]
+        key.selected += 1
+        return key
+
+    @property
+    def stretch(self) -> float:
+        """按所有可用 key 的剩余令牌计算可选数据刷新间隔的放大倍数"""
+        now = time.monotonic()
+        available = [key for key in self.keys if key.available(now)]
+        if not available:
+            return MAX_STRETCH
+        return stretch_factor(
+            sum(key.budget.available for key in available),
+            sum(key.budget.capacity for key in self.keys),
+        )
+
+    @property
+    def stats(self) -> dict[str, dict[str, Any]]:
+        now = time.monotonic()
+        return {key.label: key.stats(now) for key in self.keys}
+
+
+def async_get_key_pool(
+    hass: HomeAssistant, keys: list[str], daily_quota: int
+) -> QWeatherKeyPool:
+    """获取一组 key 组成的 key 池，每个 key 的额度和冷却状态在集成范围内共享"""
+    states: dict[str, QWeatherKey] = hass.data.setdefault(DATA_KEYS, {})
+    pool = []
+    for key in keys:
+        budget = async_get_budget(hass, key, daily_quota)
+        if (state := states.get(key)) is None:
+            state = states[key] = QWeatherKey(key, budget)
+        pool.append(state)
+    return QWeatherKeyPool(pool)
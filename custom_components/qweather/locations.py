@@ -0,0 +1,266 @@
+"""和风天气位置列表的离线索引
+
+索引由 scripts/build_location_index.py 从和风天气发布的 LocationList 生成，
+以内存映射的方式按需读取，不依赖 Home Assistant，也不需要调用 GeoAPI。
+
+文件格式（小端序）：
+    头部        HEADER
+    ids         u32[count]      位置 ID，按 ID 升序
+    lats        i32[count]      纬度 * 1e5
+    lons        i32[count]      经度 * 1e5
+    text_offsets u32[count + 1] 每个位置的文本在 texts 中的偏移
+    by_lat      u32[count]      按纬度升序排列的位置下标
+    key_offsets u32[keys + 1]   每个搜索键在 key_texts 中的偏移
+    key_records u32[keys]       搜索键对应的位置下标
+    texts       utf-8           以 \\x1f 分隔的各项名称
+    key_texts   utf-8           归一化的搜索键，按字节升序
+"""
+import logging
+import math
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_PATH = Path(__file__).parent / "data" / "locations.bin"
+
+MAGIC = b"QWLI"
+VERSION = 1
+# magic, version, count, keys, texts 字节数, key_texts 字节数
+HEADER = struct.Struct("<4sHxxIIII")
+COORDINATE_SCALE = 100000
+TEXT_SEPARATOR = "\x1f"
+# texts 中每个位置依次保存的名称
+TEXT_FIELDS = ("name", "name_en", "adm1", "adm2", "country")
+
+KM_PER_DEGREE = 111.195
+
+
+@dataclass(frozen=True, slots=True)
+class QWeatherLocation:
+    id: str
+    name: str
+    name_en: str
+    adm1: str
+    adm2: str
+    country: str
+    latitude: float
+    longitude: float
+
+    @property
+    def label(self) -> str:
+        """用于选择列表的名称"""
+        areas = " ".join(dict.fromkeys(area for area in (self.adm1, self.adm2) if area))
+        return f"{self.name} {self.name_en} ({areas}, {self.id})"
+
+
+def normalize(text: str) -> str:
+    """搜索键的归一化：小写，去掉空白、连字符和撇号"""
+    return "".join(
+        char for char in text.casefold() if not char.isspace() and char not in "-'’")
+
+
+def _u32(data: bytes | memoryview, count: int) -> array:
+    values = array("I")
+    values.frombytes(data[:count * 4])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _i32(data: bytes | memoryview, count: int) -> array:
+    values = array("i")
+    values.frombytes(data[:count * 4])
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class QWeatherLocationIndex:
+    """只读的位置索引，数值列在加载时读入数组，文本保留在内存映射中按需解码"""
+
+    def __init__(self, buffer: bytes | mmap.mmap) -> None:
+        magic, version, count, keys, texts_size, key_texts_size = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Unsupported location index")
+
+        self._buffer = buffer
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self.ids = _u32(view[offset:], count)
+        offset += count * 4
+        self.lats = _i32(view[offset:], count)
+        offset += count * 4
+        self.lons = _i32(view[offset:], count)
+        offset += count * 4
+        self._text_offsets = _u32(view[offset:], count + 1)
+        offset += (count + 1) * 4
+        self._by_lat = _u32(view[offset:], count)
+        offset += count * 4
+        self._key_offsets = _u32(view[offset:], keys + 1)
+        offset += (keys + 1) * 4
+        self._key_records = _u32(view[offset:], keys)
+        offset += keys * 4
+        self._texts = offset
+        self._key_texts = offset + texts_size
+        if self._key_texts + key_texts_size > len(buffer):
+            raise ValueError("Truncated location index")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _key(self, i: int) -> bytes:
+        start = self._key_texts + self._key_offsets[i]
+        return self._buffer[start:self._key_texts + self._key_offsets[i + 1]]
+
+    def location(self, i: int) -> QWeatherLocation:
+        start = self._texts + self._text_offsets[i]
+        text = self._buffer[start:self._texts + self._text_offsets[i + 1]].decode()
+        names = dict(zip(TEXT_FIELDS, text.split(TEXT_SEPARATOR)))
+        return QWeatherLocation(
+            id=str(self.ids[i]),
+            latitude=self.lats[i] / COORDINATE_SCALE,
+            longitude=self.lons[i] / COORDINATE_SCALE,
+            **{field: names.get(field, "") for field in TEXT_FIELDS},
+        )
+
+    def get(self, location_id: str) -> QWeatherLocation | None:
+        """按 ID 查找位置"""
+        if not location_id.isdigit():
+            return None
+        value = int(location_id)
+        i = bisect_left(self.ids, value)
+        if i < len(self.ids) and self.ids[i] == value:
+            return self.location(i)
+        return None
+
+    def search(self, query: str, limit: int = 20) -> list[QWeatherLocation]:
+        """按名称、拼音、所在省市或 ID 的前缀搜索，完全匹配的结果排在前面"""
+        prefix = normalize(query).encode()
+        if not prefix:
+            return []
+
+        keys = len(self._key_records)
+        i = bisect_left(range(keys), prefix, key=self._key)
+        exact: list[int] = []
+        partial: list[int] = []
+        while i < keys and len(exact) + len(partial) < limit * 4:
+            key = self._key(i)
+            if not key.startswith(prefix):
+                break
+            (exact if len(key) == len(prefix) else partial).append(self._key_records[i])
+            i += 1
+
+        records = list(dict.fromkeys(exact + partial))[:limit]
+        return [self.location(record) for record in records]
+
+    def nearest(
+        self, latitude: float, longitude: float, limit: int = 5
+    ) -> list[tuple[QWeatherLocation, float]]:
+        """距离坐标最近的位置及其距离（千米）
+
+        在按纬度排序的下标中取出纬度带内的候选位置，候选不足时加宽纬度带。
+        """
+        count = len(self.ids)
+        if not count:
+            return []
+
+        scale = math.cos(math.radians(latitude))
+        band = 0.5
+        while True:
+            low = bisect_left(
+                self._by_lat, (latitude - band) * COORDINATE_SCALE,
+                key=self.lats.__getitem__)
+            high = bisect_left(
+                self._by_lat, (latitude + band) * COORDINATE_SCALE,
+                key=self.lats.__getitem__)
+            found = sorted(
+                (self._distance(record, latitude, longitude, scale), record)
+                for record in self._by_lat[low:high]
+            )[:limit]
+            # 纬度带之外的位置至少相距 band 度
+            if (len(found) == min(limit, count) and found[-1][0] <= band * KM_PER_DEGREE) \
+                    or (low == 0 and high == count):
+                return [(self.location(record), distance) for distance, record in found]
+            band *= 2
+
+    def _distance(self, record: int, latitude: float, longitude: float, scale: float) -> float:
+        """等距柱状投影下的近似距离（千米）"""
+        d_lat = self.lats[record] / COORDINATE_SCALE - latitude
+        d_lon = (self.lons[record] / COORDINATE_SCALE - longitude + 180) % 360 - 180
+        return math.hypot(d_lat, d_lon * scale) * KM_PER_DEGREE
+
+
+def load_location_index(path: Path = INDEX_PATH) -> QWeatherLocationIndex | None:
+    """以内存映射的方式加载索引，文件不存在时返回 None（阻塞调用）"""
+    if not path.exists():
+        _LOGGER.warning(
+            "Location index %s not found, only location ids are accepted; "
+            "generate it with scripts/build_location_index.py", path)
+        return None
+
+    with path.open("rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return QWeatherLocationIndex(buffer)
+    except (ValueError, struct.error):
+        _LOGGER.warning("Invalid location index %s", path, exc_info=True)
+        buffer.close()
+        return None
+
+
+def write_location_index(locations: Iterable[QWeatherLocation], path: Path) -> int:
+    """生成索引文件，返回位置数量"""
+    records = sorted(locations, key=lambda location: int(location.id))
+
+    texts = bytearray()
+    text_offsets = array("I", [0])
+    for location in records:
+        texts += TEXT_SEPARATOR.join(
+            getattr(location, field) for field in TEXT_FIELDS).encode()
+        text_offsets.append(len(texts))
+
+    keys: set[tuple[bytes, int]] = set()
+    for i, location in enumerate(records):
+        # 省和市的名称同样作为搜索键，可以列出某个地区的所有位置
+        for text in (location.id, location.name, location.name_en, location.adm1, location.adm2):
+            if key := normalize(text):
+                keys.add((key.encode(), i))
+    sorted_keys = sorted(keys)
+
+    key_texts = bytearray()
+    key_offsets = array("I", [0])
+    for key, _ in sorted_keys:
+        key_texts += key
+        key_offsets.append(len(key_texts))
+
+    lats = array("i", (round(location.latitude * COORDINATE_SCALE) for location in records))
+    lons = array("i", (round(location.longitude * COORDINATE_SCALE) for location in records))
+    columns = [
+        array("I", (int(location.id) for location in records)),
+        lats,
+        lons,
+        text_offsets,
+        array("I", sorted(range(len(records)), key=lats.__getitem__)),
+        key_offsets,
+        array("I", (i for _, i in sorted_keys)),
+    ]
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, len(records), len(sorted_keys), len(texts), len(key_texts)))
+        for column in columns:
+            file.write(column.tobytes())
+        file.write(texts)
+        file.write(key_texts)
+    return len(records)
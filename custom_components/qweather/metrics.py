@@ -0,0 +1,100 @@
+import logging
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# 请求耗时直方图的上界（秒），最后一个桶记录超过 20 秒的请求
+LATENCY_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+
+
+class QWeatherRequestMetrics:
+    """某项数据的请求统计
+
+    只在内存中累加计数，不做任何聚合，聚合推迟到读取 stats 时。
+    """
+
+    __slots__ = ("requests", "successes", "failures", "latency_buckets",
+                 "latency_total", "last_latency", "fetches", "cache_hits",
+                 "coalesced", "bytes_total", "last_bytes", "decode_total",
+                 "last_decode", "last_success", "last_failure", "last_error")
+
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.successes: int = 0
+        self.failures: dict[str, int] = {}
+        self.latency_buckets: list[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total: float = 0
+        self.last_latency: float | None = None
+        self.fetches: int = 0
+        self.cache_hits: int = 0
+        self.coalesced: int = 0
+        self.bytes_total: int = 0
+        self.last_bytes: int | None = None
+        self.decode_total: float = 0
+        self.last_decode: float | None = None
+        self.last_success: datetime | None = None
+        self.last_failure: datetime | None = None
+        self.last_error: str | None = None
+
+    def record_latency(self, latency: float) -> None:
+        self.requests += 1
+        self.latency_total += latency
+        self.last_latency = latency
+        self.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def record_fetch(self, size: int, decode: float) -> None:
+        """真正发出的请求的响应大小（字节）与解析耗时（秒）"""
+        self.fetches += 1
+        self.bytes_total += size
+        self.last_bytes = size
+        self.decode_total += decode
+        self.last_decode = decode
+
+    def record_success(self, now: datetime) -> None:
+        self.successes += 1
+        self.last_success = now
+
+    def record_failure(self, error: str, now: datetime) -> None:
+        self.failures[error] = self.failures.get(error, 0) + 1
+        self.last_failure = now
+        self.last_error = error
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """由缓存或合并请求满足的比例"""
+        return (self.cache_hits + self.coalesced) / self.requests if self.requests else 0.0
+
+    def since_success(self, now: datetime) -> float | None:
+        """距最近一次成功更新的秒数"""
+        if self.last_success is None:
+            return None
+        return (now - self.last_success).total_seconds()
+
+    def stats(self, now: datetime) -> dict[str, Any]:
+        histogram = {
+            f"le_{bound:g}": count
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)
+        }
+        histogram["inf"] = self.latency_buckets[-1]
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": dict(self.failures),
+            "last_error": self.last_error,
+            "latency_mean": self.latency_total / self.requests if self.requests else None,
+            "latency_last": self.last_latency,
+            "latency_histogram": histogram,
+            "fetches": self.fetches,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "cache_hit_rate": self.cache_hit_rate,
+            "bytes_mean": self.bytes_total / self.fetches if self.fetches else None,
+            "bytes_last": self.last_bytes,
+            "decode_mean": self.decode_total / self.fetches if self.fetches else None,
+            "decode_last": self.last_decode,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_failure": self.last_failure.isoformat() if self.last_failure else None,
+            "since_success": self.since_success(now),
+        }
@@ -0,0 +1,361 @@
+import math
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from collections.abc import Iterator
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+# 各项数据保留的字段及其类型，其余字段在解析时丢弃
+NOW_FIELDS: dict[str, type] = {
+    "obsTime": datetime,  # 数据观测时间
+    "icon": int,  # 天气图标代码
+    "text": str,  # 天气
+    "temp": float,  # 温度
+    "feelsLike": float,  # 体感温度
+    "dew": float,  # 露点温度
+    "wind360": int,  # 风向
+    "windSpeed": float,  # 风速
+    "cloud": float,  # 云量
+    "humidity": float,  # 湿度
+    "vis": float,  # 能见度
+    "pressure": float,  # 大气压强
+    "precip": float,  # 过去1小时降水量
+}
+
+HOURLY_FIELDS: dict[str, type] = {
+    "fxTime": datetime,  # 预报时间
+    "icon": int,  # 天气图标代码
+    "text": str,  # 天气
+    "temp": float,  # 温度
+    "pop": float,  # 降雨概率
+    "precip": float,  # 降雨量
+    "wind360": int,  # 风向
+    "windSpeed": float,  # 风速
+    "humidity": float,  # 湿度
+    "pressure": float,  # 大气压强
+    "cloud": float,  # 云量
+    "dew": float,  # 露点温度
+}
+
+DAILY_FIELDS: dict[str, type] = {
+    "fxDate": date,  # 预报日期
+    "iconDay": int,  # 白天天气图标代码
+    "textDay": str,  # 白天的天气
+    "iconNight": int,  # 夜间天气图标代码
+    "textNight": str,  # 夜间的天气
+    "tempMax": float,  # 最高温度
+    "tempMin": float,  # 最低温度
+    "precip": float,  # 总降雨量
+    "wind360Day": int,  # 白天风向
+    "windSpeedDay": float,  # 白天风速
+    "wind360Night": int,  # 夜间风向
+    "windSpeedNight": float,  # 夜间风速
+    "cloud": float,  # 云量
+    "humidity": float,  # 湿度
+    "pressure": float,  # 大气压强
+    "uvIndex": int,  # 紫外线强度指数
+}
+
+AIR_NOW_FIELDS: dict[str, type] = {
+    "pubTime": datetime,  # 数据发布时间
+    "aqi": int,  # 空气质量指数
+    "level": str,  # 空气质量指数等级
+    "category": str,  # 空气质量指数级别
+    "primary": str,  # 首要污染物
+    "pm10": float,  # PM10
+    "pm2p5": float,  # PM2.5
+    "no2": float,  # 二氧化氮
+    "so2": float,  # 二氧化硫
+    "co": float,  # 一氧化碳
+    "o3": float,  # 臭氧
+}
+
+INDICES_FIELDS: dict[str, type] = {
+    "date": date,  # 预报日期
+    "type": str,  # 生活指数类型
+    "name": str,  # 生活指数类型的名称
+    "level": str,  # 生活指数预报等级
+    "category": str,  # 生活指数预报级别名称
+    "text": str,  # 生活指数预报的详细描述
+}
+
+
+# 分钟级降水的时间间隔（秒）与环形缓冲区的槽数，可以容纳 4 小时的数据
+MINUTELY_STEP = 300
+MINUTELY_SLOTS = 48
+
+
+# 所有位置的预报使用相同的整点和日期，解析结果共享，长时效预报不必重复解析和存储
+_parse_datetime = lru_cache(maxsize=2048)(dt_util.parse_datetime)
+_parse_date = lru_cache(maxsize=256)(dt_util.parse_date)
+
+
+def parse_value(kind: type, value: Any) -> Any:
+    """将和风天气返回的字符串转换为对应类型，无法解析时返回 None"""
+    if value is None or value == "":
+        return None
+    if kind is datetime:
+        return value if isinstance(value, datetime) else _parse_datetime(value)
+    if kind is date:
+        return value if isinstance(value, date) else _parse_date(value)
+    if kind is str:
+        # 天气描述等取值有限，驻留后所有序列共享同一个字符串
+        return sys.intern(str(value))
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def dump_value(value: Any) -> Any:
+    """转换为可以写入 json 的值"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class QWeatherNow:
+    """实时天气，数值在解析时一次性转换，属性名与和风天气的字段名一致"""
+
+    __slots__ = tuple(NOW_FIELDS)
+
+    def __init__(self, raw: Mapping[str, Any]) -> None:
+        for field, kind in NOW_FIELDS.items():
+            setattr(self, field, parse_value(kind, raw.get(field)))
+
+    def get(self, field: str) -> Any:
+        return getattr(self, field, None)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {field: dump_value(getattr(self, field)) for field in NOW_FIELDS}
+
+
+class QWeatherRecord:
+    """单条数据，字段由 fields 决定"""
+
+    __slots__ = ("fields", "values")
+
+    def __init__(self, fields: Mapping[str, type], raw: Mapping[str, Any]) -> None:
+        self.fields: Mapping[str, type] = fields
+        self.values: dict[str, Any] = {
+            field: parse_value(kind, raw.get(field)) for field, kind in fields.items()
+        }
+
+    def get(self, field: str) -> Any:
+        return self.values.get(field)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {field: dump_value(value) for field, value in self.values.items()}
+
+
+class QWeatherSeries:
+    """列式存储的预报序列
+
+    数值字段存为 array('d')，缺失值为 NaN；其余字段存为 tuple，
+    其中的日期和字符串在所有序列间共享。
+    """
+
+    __slots__ = ("fields", "columns", "length")
+
+    def __init__(self, fields: Mapping[str, type], raw: list[Mapping[str, Any]]) -> None:
+        self.fields: Mapping[str, type] = fields
+        self.length: int = len(raw)
+        self.columns: dict[str, array | tuple] = {}
+
+        for field, kind in fields.items():
+            values = [parse_value(kind, item.get(field)) for item in raw]
+            if kind is float or kind is int:
+                self.columns[field] = array(
+                    "d", (math.nan if v is None else v for v in values))
+            else:
+                self.columns[field] = tuple(values)
+
+    def column(self, field: str) -> array | tuple:
+        return self.columns[field]
+
+    def index(self, key: str, value: Any) -> int:
+        """key 列（按时间升序）中第一个不早于 value 的位置"""
+        return bisect_left(self.columns[key], value)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def as_list(self) -> list[dict[str, Any]]:
+        """还原为逐行的数据，用于持久化"""
+        return [
+            {
+                field: dump_value(
+                    int(column[i]) if self.fields[field] is int and column[i] == column[i] else column[i])
+                for field, column in self.columns.items()
+            }
+            for i in range(self.length)
+        ]
+
+
+class QWeatherMinutely:
+    """分钟级降水预报的环形缓冲区
+
+    每个槽对应一个 5 分钟的时间点，以时间戳定位，合并新数据时只写入新增或变化的槽。
+    槽中的时间戳与查询的时间点不一致时视为没有数据。
+    """
+
+    __slots__ = ("times", "precip", "kinds", "summary", "appended", "updated")
+
+    def __init__(self, raw: Mapping[str, Any] | None = None) -> None:
+        self.times: array = array("d", [math.nan]) * MINUTELY_SLOTS
+        self.precip: array = array("d", [math.nan]) * MINUTELY_SLOTS
+        self.kinds: list[str | None] = [None] * MINUTELY_SLOTS
+        self.summary: str | None = None
+        self.appended: int = 0
+        self.updated: int = 0
+        if raw is not None:
+            self.merge(raw)
+
+    def merge(self, raw: Mapping[str, Any]) -> int:
+        """合并一次响应，返回新增或变化的槽数"""
+        self.summary = raw.get("summary")
+        changed = 0
+        for item in raw.get("minutely") or ():
+            fx_time = parse_value(datetime, item.get("fxTime"))
+            if fx_time is None:
+                continue
+            timestamp = fx_time.timestamp()
+            slot = int(timestamp // MINUTELY_STEP) % MINUTELY_SLOTS
+            precip = parse_value(float, item.get("precip"))
+            precip = math.nan if precip is None else precip
+            kind = item.get("type")
+
+            if self.times[slot] != timestamp:
+                self.times[slot] = timestamp
+                self.appended += 1
+            elif self.precip[slot] == precip and self.kinds[slot] == kind:
+                continue
+            else:
+                self.updated += 1
+            self.precip[slot] = precip
+            self.kinds[slot] = kind
+            changed += 1
+        return changed
+
+    def window(self, start: datetime, minutes: int) -> Iterator[tuple[float, float, str | None]]:
+        """按时间顺序返回 start 所在的时间点起 minutes 分钟内的 (时间戳, 降水量, 类型)"""
+        first = int(start.timestamp() // MINUTELY_STEP)
+        for step in range(first, first + min(minutes * 60 // MINUTELY_STEP, MINUTELY_SLOTS)):
+            slot = step % MINUTELY_SLOTS
+            if self.times[slot] == step * MINUTELY_STEP:
+                yield self.times[slot], self.precip[slot], self.kinds[slot]
+
+    def next_precipitation(
+        self, now: datetime, minutes: int = 120
+    ) -> tuple[datetime, str | None] | None:
+        """未来 minutes 分钟内降水开始的时间点及降水类型，正在降水时返回当前时间点"""
+        for timestamp, precip, kind in self.window(now, minutes):
+            if precip > 0:
+                return dt_util.utc_from_timestamp(timestamp), kind
+        return None
+
+    def total(self, now: datetime, minutes: int) -> float | None:
+        """未来 minutes 分钟内的总降水量，没有数据时返回 None"""
+        values = [precip for _, precip, _ in self.window(now, minutes) if precip == precip]
+        return sum(values) if values else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """还原为和风天气的响应格式，用于持久化"""
+        slots = sorted(
+            (slot for slot in range(MINUTELY_SLOTS) if self.times[slot] == self.times[slot]),
+            key=lambda slot: self.times[slot],
+        )
+        return {
+            "summary": self.summary,
+            "minutely": [
+                {
+                    "fxTime": dt_util.utc_from_timestamp(self.times[slot]).isoformat(),
+                    "precip": dump_value(self.precip[slot]),
+                    "type": self.kinds[slot],
+                }
+                for slot in slots
+            ],
+        }
+
+
+class QWeatherSeriesDiff:
+    """两次预报序列按时间对齐后的差异
+
+    kind 为 unchanged（完全相同）、shifted（只有首尾的时间点滚动，重叠部分相同）、
+    partial（重叠部分有变化）或 replaced（没有重叠的时间点）。
+    """
+
+    UNCHANGED = "unchanged"
+    SHIFTED = "shifted"
+    PARTIAL = "partial"
+    REPLACED = "replaced"
+
+    __slots__ = ("kind", "added", "removed", "changed")
+
+    def __init__(self, kind: str, added: int, removed: int, changed: int) -> None:
+        self.kind: str = kind
+        self.added: int = added
+        self.removed: int = removed
+        self.changed: int = changed
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "added": self.added,
+            "removed": self.removed,
+            "changed": self.changed,
+        }
+
+
+def diff_series(old: QWeatherSeries, new: QWeatherSeries, key: str) -> QWeatherSeriesDiff:
+    """以 key 列（fxTime 或 fxDate）对齐两次预报，逐列比较重叠的时间点"""
+    old_keys = old.column(key)
+    new_keys = new.column(key)
+    old_index = {value: i for i, value in enumerate(old_keys)}
+    pairs = [(old_index[value], i) for i, value in enumerate(new_keys) if value in old_index]
+
+    changed = 0
+    columns = [(old.column(field), new.column(field)) for field in new.fields if field != key]
+    for i, j in pairs:
+        for old_column, new_column in columns:
+            a, b = old_column[i], new_column[j]
+            # NaN 表示缺失值，两边都缺失时视为相同
+            if a != b and (a == a or b == b):
+                changed += 1
+                break
+
+    added = len(new_keys) - len(pairs)
+    removed = len(old_keys) - len(pairs)
+    if not pairs and (old_keys or new_keys):
+        kind = QWeatherSeriesDiff.REPLACED
+    elif changed:
+        kind = QWeatherSeriesDiff.PARTIAL
+    elif not added and not removed:
+        kind = QWeatherSeriesDiff.UNCHANGED
+    elif tuple(old_keys[removed:]) == tuple(new_keys[:len(new_keys) - added]):
+        kind = QWeatherSeriesDiff.SHIFTED
+    else:
+        kind = QWeatherSeriesDiff.PARTIAL
+    return QWeatherSeriesDiff(kind, added, removed, changed)
+
+
+def parse_indices(raw: list[Mapping[str, Any]]) -> dict[str, QWeatherRecord]:
+    """生活指数，以指数类型为键"""
+    records = (QWeatherRecord(INDICES_FIELDS, item) for item in raw)
+    return {record.get("type"): record for record in records}
+
+
+def dump_indices(indices: Mapping[str, QWeatherRecord]) -> list[dict[str, Any]]:
+    return [record.as_dict() for record in indices.values()]
+
+
+EMPTY_HOURLY = QWeatherSeries(HOURLY_FIELDS, [])
+EMPTY_DAILY = QWeatherSeries(DAILY_FIELDS, [])
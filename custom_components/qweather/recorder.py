@@ -0,0 +1,94 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# 内存中攒够这么多条记录后写入磁盘
+FLUSH_BATCH = 200
+
+
+class QWeatherRecorder:
+    """记录客户端的请求和响应，用于离线回放
+
+    每行一条 json 记录：t 为请求开始的 unix 时间，url 为不含 key 的请求地址，
+    latency 为请求耗时，error 为网络错误的类型，body 为响应；
+    同一 url 的响应与上一次相同时不重复保存 body，只记录 same。
+    记录先缓存在内存中，攒够一批后在线程池中追加写入 gzip 文件。
+    """
+
+    def __init__(self, hass: HomeAssistant, path: Path) -> None:
+        self._hass = hass
+        self.path: Path = path
+        self._buffer: list[str] = []
+        self._last: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.records: int = 0
+
+    def record(
+        self,
+        feature: str,
+        url: str,
+        latency: float,
+        body: dict[str, Any] | None = None,
+        error: str | None = None,
+    ) -> None:
+        record: dict[str, Any] = {
+            "t": round(time.time() - latency, 3),
+            "feature": feature,
+            "url": url,
+            "latency": round(latency, 4),
+        }
+        if error is not None:
+            record["error"] = error
+        if body is not None:
+            text = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+            digest = hash(text)
+            if self._last.get(url) == digest:
+                record["same"] = True
+            else:
+                self._last[url] = digest
+                record["body"] = body
+
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self.records += 1
+        if len(self._buffer) >= FLUSH_BATCH:
+            self._hass.async_add_executor_job(self._write, self._take())
+
+    def _take(self) -> list[str]:
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def _write(self, lines: list[str]) -> None:
+        # 每批写成一个 gzip member，多个 member 拼接后仍是合法的 gzip 文件
+        with self._lock, gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    async def async_flush(self) -> None:
+        """写入内存中剩余的记录"""
+        if self._buffer:
+            await self._hass.async_add_executor_job(self._write, self._take())
+
+
+def read_records(path: Path) -> list[dict[str, Any]]:
+    """读取全部记录，same 记录补全为上一次的 body，按请求开始的时间排序"""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+
+    # same 是按请求完成的顺序判断的
+    records.sort(key=lambda record: record["t"] + record["latency"])
+    last: dict[str, Any] = {}
+    for record in records:
+        if "body" in record:
+            last[record["url"]] = record["body"]
+        elif record.pop("same", False):
+            record["body"] = last.get(record["url"])
+
+    records.sort(key=lambda record: record["t"])
+    return records
@@ -0,0 +1,119 @@
+import random
+from datetime import datetime, timedelta
+
+from homeassistant.components.weather import (ATTR_CONDITION_HAIL,
+                                              ATTR_CONDITION_LIGHTNING_RAINY,
+                                              ATTR_CONDITION_POURING,
+                                              ATTR_CONDITION_RAINY,
+                                              ATTR_CONDITION_SNOWY,
+                                              ATTR_CONDITION_SNOWY_RAINY)
+
+from .api import QWeatherData
+from .model import QWeatherNow
+
+# 发布时间之后多久再去获取，给和风天气留出同步数据的时间
+PUBLISH_MARGIN = timedelta(minutes=1)
+# 观测到的发布间隔的平滑系数
+CADENCE_SMOOTHING = 0.3
+# 每次刷新间隔的随机抖动比例，避免多个条目同时请求
+JITTER_RATIO = 0.1
+
+# 每小时气压下降超过该值（hPa）视为天气快速变化
+PRESSURE_DROP_RATE = 1.0
+# 未来若干小时内降水概率超过该值（%）视为即将降雨
+RAIN_ONSET_POP = 60
+RAIN_ONSET_HOURS = 2
+
+PRECIPITATION_CONDITIONS = {
+    ATTR_CONDITION_HAIL,
+    ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_POURING,
+    ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_SNOWY,
+    ATTR_CONDITION_SNOWY_RAINY,
+}
+
+
+class QWeatherRefreshPolicy:
+    """根据和风天气的发布节奏自适应调整某项数据的刷新间隔"""
+
+    __slots__ = ("base", "minimum", "maximum", "cadence",
+                 "update_time", "repeats", "_random")
+
+    def __init__(
+        self, base: timedelta, minimum: timedelta, maximum: timedelta
+    ) -> None:
+        self.base: timedelta = base
+        self.minimum: timedelta = minimum
+        self.maximum: timedelta = maximum
+        self.cadence: timedelta = base
+        self.update_time: datetime | None = None
+        self.repeats: int = 0
+        self._random = random.Random()
+
+    def record(self, update_time: datetime | None) -> None:
+        """记录一次刷新得到的发布时间，发布时间没有变化时计为一次重复"""
+        if update_time is None or update_time == self.update_time:
+            self.repeats += 1
+            return
+
+        if self.update_time is not None:
+            interval = update_time - self.update_time
+            if self.minimum <= interval <= self.maximum * 2:
+                self.cadence = (
+                    self.cadence * (1 - CADENCE_SMOOTHING) + interval * CADENCE_SMOOTHING)
+
+        self.update_time = update_time
+        self.repeats = 0
+
+    def next_delay(self, now: datetime, volatile: bool = False) -> timedelta:
+        """距离下次刷新的时间"""
+        if self.repeats:
+            # 数据没有变化，按重复次数退避
+            delay = self.minimum * (2 ** min(self.repeats - 1, 8))
+        elif self.update_time is not None:
+            # 在下次预计发布之后不久获取
+            delay = self.update_time + self.cadence + PUBLISH_MARGIN - now
+        else:
+            delay = self.base
+
+        if volatile:
+            delay = min(delay, self.minimum)
+
+        delay = max(self.minimum, min(delay, self.maximum))
+        return delay * (1 + self._random.uniform(-JITTER_RATIO, JITTER_RATIO))
+
+
+class QWeatherVolatility:
+    """判断天气是否正在快速变化，例如即将降雨或气压骤降"""
+
+    __slots__ = ("_pressure", "_pressure_time", "pressure_rate")
+
+    def __init__(self) -> None:
+        self._pressure: float | None = None
+        self._pressure_time: datetime | None = None
+        # 气压变化速率，hPa/h
+        self.pressure_rate: float | None = None
+
+    def observe(self, now: QWeatherNow | None) -> None:
+        """记录一次实时天气观测"""
+        if now is None or now.pressure is None or now.obsTime is None:
+            return
+
+        if self._pressure is not None and now.obsTime > self._pressure_time:
+            hours = (now.obsTime - self._pressure_time).total_seconds() / 3600
+            self.pressure_rate = (now.pressure - self._pressure) / hours
+
+        self._pressure = now.pressure
+        self._pressure_time = now.obsTime
+
+    def is_volatile(self, weather: QWeatherData) -> bool:
+        if self.pressure_rate is not None and self.pressure_rate <= -PRESSURE_DROP_RATE:
+            return True
+
+        if weather.condition in PRECIPITATION_CONDITIONS:
+            return False
+
+        # 当前没有降水，但未来几小时可能开始降水
+        pop = weather.hourly_forecast.column("pop")[:RAIN_ONSET_HOURS]
+        return any(value >= RAIN_ONSET_POP for value in pop)
@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections.abc import Callable, Coroutine
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import BURST_WINDOW, DOMAIN, MAX_CONCURRENT_REQUESTS
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
+
+RefreshJob = Callable[[], Coroutine[Any, Any, None]]
+
+
+class QWeatherScheduler:
+    """集成范围的刷新调度器，有并发上限
+
+    所有条目的刷新任务共用一个定时器，同一时间窗口内到期的任务合并为一批执行，
+    批内按所属位置轮流排序，保证每个位置都能公平地获得请求机会。
+    任务的所有者（hub）需要先注册，注销时取消它安排的所有任务，包括正在执行的任务。
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        window: timedelta = BURST_WINDOW,
+    ) -> None:
+        self._hass = hass
+        self._window: float = window.total_seconds()
+        self.limit = asyncio.Semaphore(max_concurrency)
+        # (到期时间, 序号, 任务键)，被覆盖或取消的任务在出堆时丢弃
+        self._heap: list[tuple[float, int, tuple[int, str]]] = []
+        self._jobs: dict[tuple[int, str], tuple[int, object, RefreshJob]] = {}
+        self._seq = itertools.count()
+        self._turn: int = 0
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._timer_due: float | None = None
+        self._owners: set[int] = set()
+        self._running: dict[int, set[asyncio.Task]] = {}
+        self.batches: int = 0
+
+    @callback
+    def register(self, owner: object) -> None:
+        self._owners.add(id(owner))
+
+    @callback
+    def unregister(self, owner: object) -> None:
+        """注销 owner，取消它安排的所有任务"""
+        owner_id = id(owner)
+        self._owners.discard(owner_id)
+        for key in [key for key in self._jobs if key[0] == owner_id]:
+            del self._jobs[key]
+        for task in self._running.pop(owner_id, set()):
+            task.cancel()
+        self._async_arm_timer()
+
+    @callback
+    def schedule(
+        self, owner: object, feature: str, delay: timedelta, job: RefreshJob
+    ) -> None:
+        """在 delay 之后执行 job，同一 owner 的同一项数据只保留最后一次安排"""
+        if id(owner) not in self._owners:
+            _LOGGER.debug("Ignore refresh scheduled by an unregistered owner")
+            return
+
+        key = (id(owner), feature)
+        seq = next(self._seq)
+        due = time.monotonic() + max(delay.total_seconds(), 0)
+        self._jobs[key] = (seq, owner, job)
+        heapq.heappush(self._heap, (due, seq, key))
+        self._async_arm_timer()
+
+    @callback
+    def cancel(self, owner: object, feature: str) -> None:
+        """取消 owner 为某项数据安排的刷新，正在执行的刷新不受影响"""
+        if self._jobs.pop((id(owner), feature), None) is not None:
+            self._async_arm_timer()
+
+    def _is_valid(self, seq: int, key: tuple[int, str]) -> bool:
+        job = self._jobs.get(key)
+        return job is not None and job[0] == seq
+
+    @callback
+    def _async_arm_timer(self) -> None:
+        while self._heap and not self._is_valid(self._heap[0][1], self._heap[0][2]):
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            if self._unsub_timer is not None:
+                self._unsub_timer()
+                self._unsub_timer = None
+                self._timer_due = None
+            return
+
+        due = self._heap[0][0]
+        if self._timer_due is not None and self._timer_due <= due:
+            return
+
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+        self._timer_due = due
+        self._unsub_timer = async_call_later(
+            self._hass,
+            max(due - time.monotonic(), 0),
+            HassJob(self._async_on_timer, cancel_on_shutdown=True),
+        )
+
+    @callback
+    def _async_on_timer(self, _now: datetime) -> None:
+        self._unsub_timer = None
+        self._timer_due = None
+
+        # 取出窗口内所有到期的任务，合并为一批
+        horizon = time.monotonic() + self._window
+        batch: dict[int, list[tuple[int, RefreshJob]]] = {}
+        while self._heap and self._heap[0][0] <= horizon:
+            _, seq, key = heapq.heappop(self._heap)
+            if not self._is_valid(seq, key):
+                continue
+            _, _, job = self._jobs.pop(key)
+            batch.setdefault(key[0], []).append((key[0], job))
+
+        if batch:
+            self.batches += 1
+            for owner_id, job in self._round_robin(batch):
+                self._async_start(owner_id, job)
+
+        self._async_arm_timer()
+
+    @callback
+    def _async_start(self, owner_id: int, job: RefreshJob) -> None:
+        async def _async_run() -> None:
+            async with self.limit:
+                # 等待期间所有者可能已经注销
+                if owner_id not in self._owners:
+                    return
+                try:
+                    await job()
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("Error while refreshing qweather data")
+
+        task = self._hass.async_create_background_task(
+            _async_run(), "qweather refresh")
+        running = self._running.setdefault(owner_id, set())
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    def _round_robin(
+        self, batch: dict[int, list[tuple[int, RefreshJob]]]
+    ) -> list[tuple[int, RefreshJob]]:
+        """按位置轮流排列任务，并在批次之间轮换起始位置"""
+        queues = list(batch.values())
+        self._turn = (self._turn + 1) % len(queues)
+        queues = queues[self._turn:] + queues[:self._turn]
+        ordered: list[tuple[int, RefreshJob]] = []
+        for items in itertools.zip_longest(*queues):
+            ordered.extend(item for item in items if item is not None)
+        return ordered
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """用于发现定时器泄漏的统计"""
+        now = time.monotonic()
+        return {
+            "owners": len(self._owners),
+            "scheduled": len(self._jobs),
+            "timers": 0 if self._unsub_timer is None else 1,
+            "due": sum(
+                1 for due, seq, key in self._heap
+                if due <= now and self._is_valid(seq, key)
+            ),
+            "running": sum(len(tasks) for tasks in self._running.values()),
+            "batches": self.batches,
+        }
+
+
+def async_get_scheduler(hass: HomeAssistant) -> QWeatherScheduler:
+    """获取集成共享的刷新调度器"""
+    return hass.data.setdefault(DATA_SCHEDULER, QWeatherScheduler(hass))
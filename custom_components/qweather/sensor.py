@@ -0,0 +1,424 @@
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.components.sensor import (SensorDeviceClass, SensorEntity,
+                                             SensorEntityDescription,
+                                             SensorStateClass)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.components.weather import (
+    ATTR_FORECAST_CONDITION, ATTR_FORECAST_NATIVE_PRECIPITATION,
+    ATTR_WEATHER_APPARENT_TEMPERATURE, ATTR_WEATHER_CLOUD_COVERAGE,
+    ATTR_WEATHER_DEW_POINT, ATTR_WEATHER_HUMIDITY, ATTR_WEATHER_PRESSURE,
+    ATTR_WEATHER_TEMPERATURE, ATTR_WEATHER_VISIBILITY,
+    ATTR_WEATHER_WIND_BEARING, ATTR_WEATHER_WIND_SPEED)
+from homeassistant.const import (ATTR_ATTRIBUTION,
+                                 CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+                                 CONCENTRATION_MILLIGRAMS_PER_CUBIC_METER,
+                                 DEGREE, PERCENTAGE, EntityCategory,
+                                 UnitOfLength,
+                                 UnitOfPrecipitationDepth, UnitOfPressure,
+                                 UnitOfSpeed, UnitOfTemperature, UnitOfTime)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import dt as dt_util
+
+from .api import FORECAST_NOW_MAP, QWeatherData
+from .const import DOMAIN
+from .endpoints import ENDPOINTS, QWeatherUpdateFeature
+from .history import HISTORY_FIELDS
+from .hub import QWeatherFleet, QWeatherHub
+from .metrics import QWeatherRequestMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+# 诊断传感器只读取内存中的计数，按分钟轮询的开销可以忽略
+SCAN_INTERVAL = timedelta(minutes=1)
+
+
+@dataclass(frozen=True, kw_only=True)
+class QWeatherSensorDescription(SensorEntityDescription):
+    feature: str  # 传感器使用的数据，只有被使用的数据才会被获取
+    value_fn: Callable[[QWeatherData], Any]
+    attributes_fn: Callable[[QWeatherData], dict[str, Any]] | None = None
+    history_field: str | None = None  # 附加该字段最近的变化趋势
+
+
+# 实时天气各项数据的传感器属性，未列出的项只显示原始值
+NOW_SENSOR_OPTIONS: dict[str, dict[str, Any]] = {
+    ATTR_WEATHER_TEMPERATURE: {
+        "device_class": SensorDeviceClass.TEMPERATURE,
+        "native_unit_of_measurement": UnitOfTemperature.CELSIUS,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_APPARENT_TEMPERATURE: {
+        "device_class": SensorDeviceClass.TEMPERATURE,
+        "native_unit_of_measurement": UnitOfTemperature.CELSIUS,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_DEW_POINT: {
+        "device_class": SensorDeviceClass.TEMPERATURE,
+        "native_unit_of_measurement": UnitOfTemperature.CELSIUS,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_WIND_BEARING: {
+        "native_unit_of_measurement": DEGREE,
+    },
+    ATTR_WEATHER_WIND_SPEED: {
+        "device_class": SensorDeviceClass.WIND_SPEED,
+        "native_unit_of_measurement": UnitOfSpeed.KILOMETERS_PER_HOUR,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_CLOUD_COVERAGE: {
+        "native_unit_of_measurement": PERCENTAGE,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_HUMIDITY: {
+        "device_class": SensorDeviceClass.HUMIDITY,
+        "native_unit_of_measurement": PERCENTAGE,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_VISIBILITY: {
+        "device_class": SensorDeviceClass.DISTANCE,
+        "native_unit_of_measurement": UnitOfLength.KILOMETERS,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_WEATHER_PRESSURE: {
+        "device_class": SensorDeviceClass.ATMOSPHERIC_PRESSURE,
+        "native_unit_of_measurement": UnitOfPressure.HPA,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    ATTR_FORECAST_NATIVE_PRECIPITATION: {
+        "device_class": SensorDeviceClass.PRECIPITATION,
+        "native_unit_of_measurement": UnitOfPrecipitationDepth.MILLIMETERS,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+}
+
+# 空气质量各项数据的传感器属性，默认不启用，启用后才会请求空气质量接口
+AIR_SENSOR_OPTIONS: dict[str, dict[str, Any]] = {
+    "aqi": {
+        "device_class": SensorDeviceClass.AQI,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "pm2p5": {
+        "device_class": SensorDeviceClass.PM25,
+        "native_unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "pm10": {
+        "device_class": SensorDeviceClass.PM10,
+        "native_unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "no2": {
+        "device_class": SensorDeviceClass.NITROGEN_DIOXIDE,
+        "native_unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "so2": {
+        "device_class": SensorDeviceClass.SULPHUR_DIOXIDE,
+        "native_unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "co": {
+        "native_unit_of_measurement": CONCENTRATION_MILLIGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+    "o3": {
+        "device_class": SensorDeviceClass.OZONE,
+        "native_unit_of_measurement": CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
+        "state_class": SensorStateClass.MEASUREMENT,
+    },
+}
+
+# 生活指数的类型，默认不启用，启用后才会请求生活指数接口
+INDICES_TYPES: dict[str, str] = {
+    "1": "sport",  # 运动指数
+    "2": "car_wash",  # 洗车指数
+    "3": "dressing",  # 穿衣指数
+    "5": "uv",  # 紫外线指数
+    "9": "cold",  # 感冒指数
+}
+
+
+def _now_sensor(attr: str) -> QWeatherSensorDescription:
+    if attr == ATTR_FORECAST_CONDITION:
+        def value_fn(weather: QWeatherData) -> Any:
+            return weather.condition
+    else:
+        def value_fn(weather: QWeatherData) -> Any:
+            return weather.now_value(attr)
+
+    field = FORECAST_NOW_MAP[attr]
+    return QWeatherSensorDescription(
+        key=attr,
+        feature=QWeatherUpdateFeature.NOW,
+        value_fn=value_fn,
+        history_field=field if field in HISTORY_FIELDS else None,
+        **NOW_SENSOR_OPTIONS.get(attr, {}),
+    )
+
+
+def _air_sensor(field: str) -> QWeatherSensorDescription:
+    def value_fn(weather: QWeatherData) -> Any:
+        record = weather.get(QWeatherUpdateFeature.AIR)
+        return None if record is None else record.get(field)
+
+    def attributes_fn(weather: QWeatherData) -> dict[str, Any]:
+        record = weather.get(QWeatherUpdateFeature.AIR)
+        if record is None:
+            return {}
+        return {"category": record.get("category"), "primary": record.get("primary")}
+
+    return QWeatherSensorDescription(
+        key=f"air_{field}",
+        feature=QWeatherUpdateFeature.AIR,
+        entity_registry_enabled_default=False,
+        value_fn=value_fn,
+        attributes_fn=attributes_fn if field == "aqi" else None,
+        **AIR_SENSOR_OPTIONS[field],
+    )
+
+
+def _indices_sensor(index_type: str, slug: str) -> QWeatherSensorDescription:
+    def value_fn(weather: QWeatherData) -> Any:
+        record = (weather.get(QWeatherUpdateFeature.INDICES) or {}).get(index_type)
+        return None if record is None else record.get("category")
+
+    def attributes_fn(weather: QWeatherData) -> dict[str, Any]:
+        record = (weather.get(QWeatherUpdateFeature.INDICES) or {}).get(index_type)
+        if record is None:
+            return {}
+        return {field: record.get(field) for field in ("name", "level", "text")}
+
+    return QWeatherSensorDescription(
+        key=f"indices_{slug}",
+        feature=QWeatherUpdateFeature.INDICES,
+        entity_registry_enabled_default=False,
+        value_fn=value_fn,
+        attributes_fn=attributes_fn,
+    )
+
+
+def _minutely_start(weather: QWeatherData) -> datetime | None:
+    minutely = weather.minutely
+    onset = None if minutely is None else minutely.next_precipitation(dt_util.utcnow())
+    return None if onset is None else onset[0]
+
+
+def _minutely_attributes(weather: QWeatherData) -> dict[str, Any]:
+    minutely = weather.minutely
+    if minutely is None:
+        return {}
+    onset = minutely.next_precipitation(dt_util.utcnow())
+    return {
+        "type": None if onset is None else onset[1],
+        "summary": minutely.summary,
+    }
+
+
+def _minutely_total(weather: QWeatherData) -> float | None:
+    minutely = weather.minutely
+    return None if minutely is None else minutely.total(dt_util.utcnow(), 60)
+
+
+# 分钟级降水默认不启用，启用后才会每 5 分钟左右请求一次
+MINUTELY_SENSORS: tuple[QWeatherSensorDescription, ...] = (
+    QWeatherSensorDescription(
+        key="precipitation_start",
+        feature=QWeatherUpdateFeature.MINUTELY,
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_registry_enabled_default=False,
+        value_fn=_minutely_start,
+        attributes_fn=_minutely_attributes,
+    ),
+    QWeatherSensorDescription(
+        key="precipitation_next_hour",
+        feature=QWeatherUpdateFeature.MINUTELY,
+        device_class=SensorDeviceClass.PRECIPITATION,
+        native_unit_of_measurement=UnitOfPrecipitationDepth.MILLIMETERS,
+        entity_registry_enabled_default=False,
+        value_fn=_minutely_total,
+    ),
+)
+
+WEATHER_SENSORS: tuple[QWeatherSensorDescription, ...] = (
+    *(_now_sensor(attr) for attr in FORECAST_NOW_MAP),
+    *(_air_sensor(field) for field in AIR_SENSOR_OPTIONS),
+    *(_indices_sensor(index_type, slug) for index_type, slug in INDICES_TYPES.items()),
+    *MINUTELY_SENSORS,
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class QWeatherDiagnosticDescription(SensorEntityDescription):
+    value_fn: Callable[[QWeatherRequestMetrics], Any]
+    attributes_fn: Callable[[QWeatherRequestMetrics], dict[str, Any]] | None = None
+
+
+DIAGNOSTIC_SENSORS: tuple[QWeatherDiagnosticDescription, ...] = (
+    QWeatherDiagnosticDescription(
+        key="last_success",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda metrics: metrics.last_success,
+        attributes_fn=lambda metrics: {
+            "last_failure": metrics.last_failure,
+            "last_error": metrics.last_error,
+        },
+    ),
+    QWeatherDiagnosticDescription(
+        key="latency",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda metrics: (
+            metrics.last_latency * 1000 if metrics.last_latency is not None else None),
+        attributes_fn=lambda metrics: {
+            "bytes": metrics.last_bytes,
+            "decode_ms": (
+                metrics.last_decode * 1000 if metrics.last_decode is not None else None),
+        },
+    ),
+    QWeatherDiagnosticDescription(
+        key="failures",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: sum(metrics.failures.values()),
+        attributes_fn=lambda metrics: dict(metrics.failures),
+    ),
+    QWeatherDiagnosticDescription(
+        key="cache_hit_rate",
+        native_unit_of_measurement="%",
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda metrics: metrics.cache_hit_rate * 100,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    fleet: QWeatherFleet = hass.data[DOMAIN][config_entry.entry_id]
+
+    async_add_entities(
+        [
+            QWeatherSensor(hub, description)  # 所有传感器读取 hub 已有的数据，不产生额外请求
+            for hub in fleet.hubs
+            for description in WEATHER_SENSORS
+            if hub.supports(description.feature)
+        ]
+        + [
+            QWeatherDiagnosticSensor(hub, feature, description)
+            for hub in fleet.hubs
+            for feature in ENDPOINTS
+            if hub.supports(feature)
+            for description in DIAGNOSTIC_SENSORS
+        ]
+    )
+
+
+class QWeatherSensor(SensorEntity):
+    """hub 中某项数据的一个值"""
+
+    entity_description: QWeatherSensorDescription
+
+    def __init__(
+        self,
+        hub: QWeatherHub,
+        description: QWeatherSensorDescription,
+    ) -> None:
+        self._hub: QWeatherHub = hub
+        self.entity_description = description
+        self._attr_unique_id = f"{hub.name}-{description.key}"
+        self._attr_name = f"qweather-{hub.name}-{description.key}"
+        self._written_state = self._state()
+        self._attr_native_value, self._attr_available, _ = self._written_state
+
+    @property
+    def should_poll(self) -> bool:
+        return False
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {ATTR_ATTRIBUTION: "来自和风天气的天气数据", **self._written_state[2]}
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._hub.async_add_listener(
+                self._async_handle_feature_update,
+                (self.entity_description.feature,),
+            ))
+
+    def _state(self) -> tuple[Any, bool, dict[str, Any]]:
+        description = self.entity_description
+        weather = self._hub.weather
+        attributes = (
+            description.attributes_fn(weather)
+            if description.attributes_fn is not None else {}
+        )
+        if description.history_field is not None:
+            attributes = {
+                **attributes, **self._hub.history.stats(description.history_field)}
+        return (
+            description.value_fn(weather),
+            weather.get(description.feature) is not None,
+            attributes,
+        )
+
+    @callback
+    def _async_handle_feature_update(self, feature: str) -> None:
+        """只有自身的值变化时才写入状态"""
+        state = self._state()
+        if state == self._written_state:
+            return
+
+        self._written_state = state
+        self._attr_native_value, self._attr_available, _ = state
+        self.async_write_ha_state()
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return self._hub.device_info
+
+
+class QWeatherDiagnosticSensor(SensorEntity):
+    """某项数据的请求统计，默认不启用"""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    entity_description: QWeatherDiagnosticDescription
+
+    def __init__(
+        self,
+        hub: QWeatherHub,
+        feature: str,
+        description: QWeatherDiagnosticDescription,
+    ) -> None:
+        self._hub: QWeatherHub = hub
+        self._metrics: QWeatherRequestMetrics = hub.request_metrics(feature)
+        self.entity_description = description
+        self._attr_unique_id = f"{hub.name}-{feature}-{description.key}"
+        self._attr_name = f"qweather-{hub.name}-{feature}-{description.key}"
+
+    @property
+    def native_value(self) -> datetime | float | int | None:
+        return self.entity_description.value_fn(self._metrics)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._metrics)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return self._hub.device_info
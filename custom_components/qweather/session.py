@@ -0,0 +1,114 @@
+import logging
+from types import SimpleNamespace
+
+from aiohttp import (ClientSession, ClientTimeout, TCPConnector, TraceConfig,
+                     TraceConnectionCreateEndParams,
+                     TraceConnectionReuseconnParams)
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_SESSION = f"{DOMAIN}_session"
+
+# 刷新间隔以分钟计，空闲连接需要保持得比 aiohttp 默认的 15 秒更久才有复用的机会
+KEEPALIVE_TIMEOUT: float = 120
+DNS_CACHE_TTL: int = 600
+
+
+class QWeatherSession:
+    """整个集成共享的 HTTP 连接池，所有 hub 的请求复用同一组连接"""
+
+    def __init__(self) -> None:
+        self._session: ClientSession | None = None
+        self._users: int = 0
+        self.connections_created: int = 0
+        self.connections_reused: int = 0
+
+    async def _on_connection_create_end(
+        self,
+        session: ClientSession,
+        context: SimpleNamespace,
+        params: TraceConnectionCreateEndParams,
+    ) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reuseconn(
+        self,
+        session: ClientSession,
+        context: SimpleNamespace,
+        params: TraceConnectionReuseconnParams,
+    ) -> None:
+        self.connections_reused += 1
+
+    def acquire(self) -> ClientSession:
+        """获取共享会话，首次调用时创建"""
+        if self._session is None or self._session.closed:
+            trace_config = TraceConfig()
+            trace_config.on_connection_create_end.append(
+                self._on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(
+                self._on_connection_reuseconn)
+
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=10,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                ),
+                timeout=ClientTimeout(total=20),
+                trace_configs=[trace_config],
+            )
+
+        self._users += 1
+        return self._session
+
+    async def release(self) -> None:
+        """释放共享会话，最后一个使用者释放时关闭连接池"""
+        self._users -= 1
+        if self._users > 0:
+            return
+
+        await self.async_close()
+
+    async def async_close(self) -> None:
+        """关闭连接池，不论是否仍有使用者"""
+        self._users = 0
+        if self._session is not None:
+            _LOGGER.debug(
+                "Close qweather session, %d connections created, %d reused",
+                self.connections_created, self.connections_reused)
+            await self._session.close()
+            self._session = None
+
+    @property
+    def reuse_ratio(self) -> float:
+        """连接复用率"""
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": self.reuse_ratio,
+        }
+
+
+def async_get_session(hass: HomeAssistant) -> QWeatherSession:
+    """获取集成共享的连接池，Home Assistant 停止时关闭
+
+    Home Assistant 停止时不会卸载配置条目，连接池不能只在最后一个 hub 释放时关闭。
+    """
+    if (session := hass.data.get(DATA_SESSION)) is None:
+        session = hass.data[DATA_SESSION] = QWeatherSession()
+
+        async def _async_close(event: Event) -> None:
+            await session.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return session
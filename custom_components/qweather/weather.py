@@ -1,20 +1,18 @@
 import logging
-from datetime import timedelta
-from .api import format_condition, FORECAST_DAILY_MAP_DAY, FORECAST_DAILY_MAP_NIGHT, FORECAST_HOURLY_MAP, FORECAST_NOW_MAP
 
-from homeassistant.components.weather import Forecast, WeatherEntity, WeatherEntityFeature, ATTR_FORECAST_CONDITION, ATTR_FORECAST_IS_DAYTIME
+from homeassistant.components.weather import Forecast, WeatherEntity, WeatherEntityFeature
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (ATTR_ATTRIBUTION, UnitOfPrecipitationDepth,
                                  UnitOfPressure, UnitOfSpeed,
                                  UnitOfTemperature)
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN
-from .hub import QWeatherHub
+from .endpoints import QWeatherUpdateFeature
+from .hub import QWeatherFleet, QWeatherHub
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,25 +22,13 @@ async def async_setup_entry(
     config_entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-    hub: QWeatherHub = hass.data[DOMAIN][config_entry.entry_id]
-
-    await hub.async_update_weather_now()
-    await hub.async_update_weather_hourly()
-    await hub.async_update_weather_daily()
-
-    async_track_time_interval(
-        hass, hub.async_update_weather_now, timedelta(minutes=10))
-
-    async_track_time_interval(
-        hass, hub.async_update_weather_hourly, timedelta(minutes=15))
-
-    async_track_time_interval(
-        hass, hub.async_update_weather_daily, timedelta(hours=3))
+    fleet: QWeatherFleet = hass.data[DOMAIN][config_entry.entry_id]
 
     async_add_entities(
         [
-            QWeather(hub),  # 每日天气预报
-        ], True
+            QWeather(hub)  # 每个位置一个天气实体
+            for hub in fleet.hubs
+        ]
     )
 
 
@@ -65,6 +51,9 @@ class QWeather(WeatherEntity):
         self._hub: QWeatherHub = hub
         self._attr_unique_id = f"{self._hub.name}"
         self._attr_name = f"weather-{self._hub.name}"
+        self._written_state: tuple | None = None
+        # 已推送给预报订阅者的数据版本
+        self._forecast_generations: dict[str, int] = {}
 
     @property
     def attribution(self) -> str:
@@ -72,7 +61,63 @@ class QWeather(WeatherEntity):
 
     @property
     def should_poll(self) -> bool:
-        return True
+        return False
+
+    @property
+    def available(self) -> bool:
+        return self._hub.weather.condition is not None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # 实体加入时 Home Assistant 会写入一次当前状态
+        self._written_state = self._visible_state()
+        # 订阅者订阅时获取当前的预报，之后只推送新的数据版本
+        for feature in (QWeatherUpdateFeature.HOURLY, QWeatherUpdateFeature.DAILY):
+            self._forecast_generations[feature] = self._hub.weather.generation(feature)
+        self.async_on_remove(
+            self._hub.async_add_listener(
+                self._async_handle_feature_update,
+                (QWeatherUpdateFeature.NOW, QWeatherUpdateFeature.HOURLY,
+                 QWeatherUpdateFeature.DAILY),
+            ))
+
+    def _visible_state(self) -> tuple:
+        weather = self._hub.weather
+        return (
+            weather.condition,
+            weather.temperature,
+            weather.apparent_temperature,
+            weather.dew_point,
+            weather.humidity,
+            weather.wind_bearing,
+            weather.wind_speed,
+            weather.cloud_coverage,
+            weather.visibility,
+            weather.pressure,
+            self._hub.stale,
+        )
+
+    @callback
+    def _async_handle_feature_update(self, feature: str) -> None:
+        """hub 数据更新后刷新实体状态或预报，状态没有变化时不写入"""
+        state = self._visible_state()
+        if state != self._written_state:
+            self._written_state = state
+            self.async_write_ha_state()
+
+        # 只有过期标记变化或预报没有差异时数据版本不变，不向订阅者推送相同的预报
+        generation = self._hub.weather.generation(feature)
+        if self._forecast_generations.get(feature, generation) == generation:
+            return
+        self._forecast_generations[feature] = generation
+
+        match feature:
+            case QWeatherUpdateFeature.HOURLY:
+                self.hass.async_create_task(
+                    self.async_update_listeners(("hourly",)))
+            case QWeatherUpdateFeature.DAILY:
+                self.hass.async_create_task(
+                    self.async_update_listeners(("twice_daily",)))
 
     @property
     def condition(self) -> str | None:
@@ -92,7 +137,7 @@ class QWeather(WeatherEntity):
 
     @property
     def humidity(self) -> float | None:
-        return float(self._hub.weather.humidity)
+        return self._hub.weather.humidity
 
     @property
     def wind_bearing(self) -> float | None:
@@ -119,55 +164,18 @@ class QWeather(WeatherEntity):
         if self.condition is not None:
             return {
                 ATTR_ATTRIBUTION: self.attribution,
+                "stale": self._hub.stale,
             }
 
-    def __forecast_daily(self, item: dict, is_daytime: bool) -> dict[str] | None:
-        ha_item_day = {
-            k: item[v]
-            for k, v in (FORECAST_DAILY_MAP_DAY if is_daytime else FORECAST_DAILY_MAP_NIGHT).items()
-            if item.get(v) is not None
-        }
-        if ha_item_day.get(ATTR_FORECAST_CONDITION):
-            ha_item_day[ATTR_FORECAST_CONDITION] = format_condition(
-                ha_item_day[ATTR_FORECAST_CONDITION]
-            )
-        ha_item_day[ATTR_FORECAST_IS_DAYTIME] = is_daytime
-
-        return ha_item_day
-
     async def async_forecast_twice_daily(self) -> list[Forecast] | None:
-        forecast = self._hub.weather.daily_forecast
-
-        ha_forecast: list[Forecast] = []
-        for item in forecast:
-            ha_forecast.append(self.__forecast_daily(item, True))
-            ha_forecast.append(self.__forecast_daily(item, False))
-        return ha_forecast
+        # 只转换从今天起的部分，已经过去的日期不再输出
+        return self._hub.weather.twice_daily_window(since=dt_util.now().date())
 
     async def async_forecast_hourly(self) -> list[Forecast] | None:
-        forecast = self._hub.weather.hourly_forecast
-
-        ha_forecast: list[Forecast] = []
-        for met_item in forecast:
-            ha_item = {
-                k: met_item[v]
-                for k, v in FORECAST_HOURLY_MAP.items()
-                if met_item.get(v) is not None
-            }
-            if ha_item.get(ATTR_FORECAST_CONDITION):
-                ha_item[ATTR_FORECAST_CONDITION] = format_condition(
-                    ha_item[ATTR_FORECAST_CONDITION]
-                )
-            ha_forecast.append(ha_item)
-        return ha_forecast
+        # 只转换从当前小时起的部分，已经过去的时间点不再输出
+        return self._hub.weather.hourly_window(
+            since=dt_util.now().replace(minute=0, second=0, microsecond=0))
 
     @property
     def device_info(self) -> DeviceInfo:
-        return DeviceInfo(
-            name="天气预报",
-            entry_type=DeviceEntryType.SERVICE,
-            identifiers={(DOMAIN,)},
-            manufacturer="和风天气",
-            model="Forecast",
-            configuration_url="https://console.qweather.com/#/console",
-        )
+        return self._hub.device_info
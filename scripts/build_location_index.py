@@ -0,0 +1,73 @@
+"""从和风天气发布的位置列表生成离线位置索引
+
+    python scripts/build_location_index.py China-City-List-latest.csv [--output PATH]
+
+位置列表见 https://github.com/qwd/LocationList ，生成的索引默认写入
+custom_components/qweather/data/locations.bin。
+"""
+import argparse
+import csv
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_locations():
+    # 直接按路径加载，不需要安装 Home Assistant
+    spec = importlib.util.spec_from_file_location(
+        "qweather_locations", ROOT / "custom_components/qweather/locations.py")
+    module = importlib.util.module_from_spec(spec)
+    # dataclass 需要能在 sys.modules 中找到所在模块
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_rows(path: Path):
+    with path.open(encoding="utf-8-sig", newline="") as file:
+        lines = iter(file)
+        # 部分版本的列表第一行是版本说明，不是表头
+        for line in lines:
+            if line.startswith("Location_ID"):
+                break
+        yield from csv.DictReader([line, *lines])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", type=Path, nargs="+")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    locations = load_locations()
+    records = {}
+    for source in args.source:
+        for row in read_rows(source):
+            location_id = (row.get("Location_ID") or "").strip()
+            if not location_id.isdigit():
+                continue
+            try:
+                latitude = float(row["Latitude"])
+                longitude = float(row["Longitude"])
+            except (KeyError, ValueError):
+                continue
+            records[location_id] = locations.QWeatherLocation(
+                id=location_id,
+                name=row.get("Location_Name_ZH", "").strip(),
+                name_en=row.get("Location_Name_EN", "").strip(),
+                adm1=row.get("Adm1_Name_ZH", "").strip(),
+                adm2=row.get("Adm2_Name_ZH", "").strip(),
+                country=row.get("Country_Region_ZH", "").strip(),
+                latitude=latitude,
+                longitude=longitude,
+            )
+
+    output = args.output or locations.INDEX_PATH
+    count = locations.write_location_index(records.values(), output)
+    print(f"{count} locations, {output.stat().st_size} bytes -> {output}")
+
+
+if __name__ == "__main__":
+    main()
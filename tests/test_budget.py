@@ -0,0 +1,60 @@
+"""API key 的请求额度"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather import budget as budget_module  # noqa: E402
+from custom_components.qweather.budget import (  # noqa: E402
+    PRIORITY_RESERVE, QWeatherBudget)
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    """固定令牌桶使用的时钟和日期"""
+    state = SimpleNamespace(monotonic=1000.0, today=date(2024, 1, 1))
+    monkeypatch.setattr(
+        budget_module, "time", SimpleNamespace(monotonic=lambda: state.monotonic))
+    monkeypatch.setattr(
+        budget_module.dt_util, "now", lambda: SimpleNamespace(date=lambda: state.today))
+    return state
+
+
+def test_low_priority_refused_while_reserve_held(clock: SimpleNamespace) -> None:
+    budget = QWeatherBudget(240)
+    reserve = budget.capacity * PRIORITY_RESERVE
+    while budget.tokens >= 1 + reserve:
+        assert budget.try_acquire(1)
+
+    assert not budget.try_acquire(1)
+    assert budget.denied == 1
+    # 保留的令牌只能被高优先级的请求使用
+    assert budget.try_acquire(0)
+
+
+def test_tokens_refill_over_time(clock: SimpleNamespace) -> None:
+    budget = QWeatherBudget(240)
+    while budget.try_acquire(0):
+        pass
+    assert budget.tokens < 1
+
+    # 每天 240 次，每 6 分钟补充一个令牌
+    clock.monotonic += 360
+    assert budget.try_acquire(0)
+    assert not budget.try_acquire(0)
+
+
+def test_daily_quota_resets_at_midnight(clock: SimpleNamespace) -> None:
+    budget = QWeatherBudget(5)
+    for _ in range(5):
+        assert budget.try_acquire(0)
+    # 桶中仍有令牌，但今天的额度已经用完
+    assert budget.tokens >= 1
+    assert not budget.try_acquire(0)
+    assert budget.remaining_today == 0
+
+    clock.today = date(2024, 1, 2)
+    assert budget.try_acquire(0)
+    assert budget.used_today == 1
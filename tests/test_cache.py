@@ -0,0 +1,100 @@
+"""请求合并层"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather.budget import (  # noqa: E402
+    QWeatherBudget, QWeatherBudgetExceeded)
+from custom_components.qweather.cache import QWeatherRequestCache  # noqa: E402
+
+CACHE_KEY = "https://devapi.qweather.com/v7/weather/now?location=101010100"
+
+
+class FakeResponse:
+    def __init__(self, body: dict) -> None:
+        self.status = 200
+        self.ok = True
+        self.headers: dict[str, str] = {}
+        self._body = json.dumps(body).encode()
+
+    async def __aenter__(self) -> "FakeResponse":
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return self._body
+
+
+class FakeSession:
+    """按 url 中的 key 返回响应，记录请求过的 key"""
+
+    def __init__(self, bodies: dict[str, dict]) -> None:
+        self.bodies = bodies
+        self.requested: list[str] = []
+
+    def get(self, url: str, headers: dict[str, str]) -> FakeResponse:
+        key = url.rsplit("key=", 1)[1]
+        self.requested.append(key)
+        return FakeResponse(self.bodies[key])
+
+
+def url(key: str) -> str:
+    return f"{CACHE_KEY}&key={key}"
+
+
+async def fetch(cache: QWeatherRequestCache, session: FakeSession, key: str, budget=None):
+    return await cache.async_get(
+        session, url(key), 60, budget, cache_key=CACHE_KEY, requester=key)
+
+
+def test_error_payload_not_shared_across_keys() -> None:
+    session = FakeSession({"a": {"code": "401"}, "b": {"code": "200", "now": {}}})
+    cache = QWeatherRequestCache()
+
+    async def run():
+        return await asyncio.gather(fetch(cache, session, "a"), fetch(cache, session, "b"))
+
+    (data_a, by_a), (data_b, by_b) = asyncio.run(run())
+    assert (data_a["code"], by_a) == ("401", "a")
+    assert (data_b["code"], by_b) == ("200", "b")
+    assert session.requested == ["a", "b"]
+
+
+def test_success_shared_across_keys() -> None:
+    session = FakeSession({"a": {"code": "200", "now": {}}, "b": {"code": "200", "now": {}}})
+    cache = QWeatherRequestCache()
+
+    async def run():
+        return await asyncio.gather(fetch(cache, session, "a"), fetch(cache, session, "b"))
+
+    (_, by_a), (_, by_b) = asyncio.run(run())
+    assert by_a == by_b == "a"
+    assert session.requested == ["a"]
+    assert cache.coalesced == 1
+
+
+def test_budget_exhaustion_not_shared_across_keys() -> None:
+    session = FakeSession({"a": {"code": "200", "now": {}}, "b": {"code": "200", "now": {}}})
+    cache = QWeatherRequestCache()
+    exhausted = QWeatherBudget(1)
+    assert exhausted.try_acquire()
+    available = QWeatherBudget(1000)
+
+    async def run():
+        return await asyncio.gather(
+            fetch(cache, session, "a", exhausted),
+            fetch(cache, session, "b", available),
+            return_exceptions=True,
+        )
+
+    result_a, result_b = asyncio.run(run())
+    assert isinstance(result_a, QWeatherBudgetExceeded)
+    assert result_b[1] == "b"
+    assert session.requested == ["b"]
+    assert available.used_today == 1
@@ -0,0 +1,60 @@
+"""天气状况的转换"""
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.components.weather import (  # noqa: E402
+    ATTR_CONDITION_CLEAR_NIGHT, ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_EXCEPTIONAL, ATTR_CONDITION_FOG, ATTR_CONDITION_HAIL,
+    ATTR_CONDITION_LIGHTNING, ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_PARTLYCLOUDY, ATTR_CONDITION_POURING, ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_SNOWY, ATTR_CONDITION_SNOWY_RAINY, ATTR_CONDITION_SUNNY,
+    ATTR_CONDITION_WINDY, ATTR_CONDITION_WINDY_VARIANT)
+
+from custom_components.qweather.api import (  # noqa: E402
+    CONDITION_BY_ICON, WEATHER_ICONS, format_condition)
+
+HA_CONDITIONS = {
+    ATTR_CONDITION_CLEAR_NIGHT,
+    ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_EXCEPTIONAL,
+    ATTR_CONDITION_FOG,
+    ATTR_CONDITION_HAIL,
+    ATTR_CONDITION_LIGHTNING,
+    ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_PARTLYCLOUDY,
+    ATTR_CONDITION_POURING,
+    ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_SNOWY,
+    ATTR_CONDITION_SNOWY_RAINY,
+    ATTR_CONDITION_SUNNY,
+    ATTR_CONDITION_WINDY,
+    ATTR_CONDITION_WINDY_VARIANT,
+}
+
+
+@pytest.mark.parametrize("icon", sorted(WEATHER_ICONS))
+def test_every_icon_resolves(icon: int) -> None:
+    assert CONDITION_BY_ICON[icon] in HA_CONDITIONS
+    # 和风天气返回的图标代码是字符串
+    assert format_condition(None, str(icon)) == CONDITION_BY_ICON[icon]
+
+
+def test_clear_night_icon() -> None:
+    assert format_condition("晴", "150") == ATTR_CONDITION_CLEAR_NIGHT
+
+
+def test_sunny_at_night() -> None:
+    assert format_condition("晴", "100") == ATTR_CONDITION_SUNNY
+    assert format_condition("晴", "100", is_daytime=False) == ATTR_CONDITION_CLEAR_NIGHT
+
+
+def test_text_fallback() -> None:
+    assert format_condition("小雨") == ATTR_CONDITION_RAINY
+    # 未收录的图标代码
+    assert format_condition("雾", "1234") == ATTR_CONDITION_FOG
+
+
+def test_non_numeric_icon() -> None:
+    assert format_condition("多云", "abc") == ATTR_CONDITION_CLOUDY
+    assert format_condition("晴", "", is_daytime=False) == ATTR_CONDITION_CLEAR_NIGHT
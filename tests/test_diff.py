@@ -0,0 +1,42 @@
+"""预报序列的差异"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather.model import (  # noqa: E402
+    HOURLY_FIELDS, QWeatherSeries, QWeatherSeriesDiff, diff_series)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def hourly(first: int, temps: list[str | None]) -> QWeatherSeries:
+    return QWeatherSeries(HOURLY_FIELDS, [
+        {"fxTime": (START + timedelta(hours=first + i)).isoformat(), "temp": temp}
+        for i, temp in enumerate(temps)
+    ])
+
+
+def test_diff_unchanged() -> None:
+    diff = diff_series(hourly(0, ["1", "2", None]), hourly(0, ["1", "2", None]), "fxTime")
+    assert diff.kind == QWeatherSeriesDiff.UNCHANGED
+    assert (diff.added, diff.removed, diff.changed) == (0, 0, 0)
+
+
+def test_diff_shifted() -> None:
+    diff = diff_series(hourly(0, ["1", "2", "3"]), hourly(1, ["2", "3", "4"]), "fxTime")
+    assert diff.kind == QWeatherSeriesDiff.SHIFTED
+    assert (diff.added, diff.removed, diff.changed) == (1, 1, 0)
+
+
+def test_diff_partial() -> None:
+    diff = diff_series(hourly(0, ["1", "2", "3"]), hourly(1, ["2", "5", "4"]), "fxTime")
+    assert diff.kind == QWeatherSeriesDiff.PARTIAL
+    assert (diff.added, diff.removed, diff.changed) == (1, 1, 1)
+
+
+def test_diff_replaced() -> None:
+    diff = diff_series(hourly(0, ["1", "2"]), hourly(5, ["1", "2"]), "fxTime")
+    assert diff.kind == QWeatherSeriesDiff.REPLACED
+    assert (diff.added, diff.removed, diff.changed) == (2, 2, 0)
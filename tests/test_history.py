@@ -0,0 +1,94 @@
+"""实时天气观测历史"""
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather.history import (  # noqa: E402
+    DEFAULT_TREND_THRESHOLD, TREND_THRESHOLDS, TREND_WINDOWS, QWeatherHistory)
+from custom_components.qweather.model import QWeatherNow  # noqa: E402
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None or value != value else round(value, 2)
+
+
+def brute_force_stats(
+    observations: list[tuple[float, float]], field: str, span_hours: int
+) -> dict:
+    """直接遍历保留的观测计算统计值"""
+    latest_time, latest = observations[-1]
+    result = {}
+    rate = None
+    for window in TREND_WINDOWS:
+        seconds = window.total_seconds()
+        lagged = [item for item in observations if item[0] <= latest_time - seconds]
+        change = None
+        if lagged:
+            lagged_time, value = lagged[-1]
+            change = latest - value
+            if change == change:
+                rate = change / ((latest_time - lagged_time) / 3600)
+        result[f"change_{round(seconds / 3600)}h"] = _round(change)
+
+    threshold = TREND_THRESHOLDS.get(field, DEFAULT_TREND_THRESHOLD)
+    if rate is None:
+        trend = None
+    elif rate >= threshold:
+        trend = "rising"
+    elif rate <= -threshold:
+        trend = "falling"
+    else:
+        trend = "steady"
+
+    values = [value for _, value in observations if value == value]
+    result.update({
+        "rate": None if rate is None else round(rate, 2),
+        "trend": trend,
+        f"min_{span_hours}h": _round(min(values)) if values else None,
+        f"max_{span_hours}h": _round(max(values)) if values else None,
+    })
+    return result
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stats_match_brute_force(seed: int) -> None:
+    rng = random.Random(seed)
+    capacity = 16
+    span = timedelta(hours=4)
+    history = QWeatherHistory(("temp",), capacity, span)
+    retained: list[tuple[float, float]] = []
+
+    moment = START
+    for _ in range(200):
+        moment += timedelta(minutes=rng.choice((5, 10, 10, 15, 40)))
+        temp = None if rng.random() < 0.1 else round(rng.uniform(-5, 5), 1)
+        assert history.append(QWeatherNow({
+            "obsTime": moment.isoformat(),
+            "temp": None if temp is None else str(temp),
+        }))
+
+        timestamp = moment.timestamp()
+        if len(retained) == capacity:
+            retained.pop(0)
+        retained.append((timestamp, math.nan if temp is None else temp))
+        retained = [item for item in retained if item[0] >= timestamp - span.total_seconds()]
+
+        assert len(history) == len(retained)
+        assert history.stats("temp") == brute_force_stats(retained, "temp", 4)
+
+
+def test_ignores_out_of_order_observations() -> None:
+    history = QWeatherHistory(("temp",))
+    assert history.append(QWeatherNow({"obsTime": START.isoformat(), "temp": "1"}))
+    assert not history.append(QWeatherNow({"obsTime": START.isoformat(), "temp": "2"}))
+    assert not history.append(QWeatherNow({
+        "obsTime": (START - timedelta(minutes=10)).isoformat(), "temp": "3"}))
+    assert not history.append(None)
+    assert len(history) == 1
+    assert history.stats("temp")["max_24h"] == 1
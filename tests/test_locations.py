@@ -0,0 +1,50 @@
+"""离线位置索引"""
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather.locations import (  # noqa: E402
+    QWeatherLocation, load_location_index, write_location_index)
+
+LOCATIONS = [
+    QWeatherLocation("101010100", "北京", "Beijing", "北京市", "北京", "中国", 39.90, 116.41),
+    QWeatherLocation("101010200", "海淀", "Haidian", "北京市", "北京", "中国", 39.96, 116.30),
+    QWeatherLocation("101020100", "上海", "Shanghai", "上海市", "上海", "中国", 31.23, 121.47),
+    QWeatherLocation("101280601", "深圳", "Shenzhen", "广东省", "深圳", "中国", 22.55, 114.09),
+]
+
+
+@pytest.fixture
+def index(tmp_path: Path):
+    path = tmp_path / "locations.bin"
+    assert write_location_index(LOCATIONS, path) == len(LOCATIONS)
+    return load_location_index(path)
+
+
+def test_get(index) -> None:
+    assert index.get("101020100") == LOCATIONS[2]
+    assert index.get("101020101") is None
+    assert index.get("shanghai") is None
+
+
+def test_search_by_name_and_pinyin(index) -> None:
+    assert [location.id for location in index.search("上海")] == ["101020100"]
+    assert [location.id for location in index.search("hai")] == ["101010200"]
+    assert [location.id for location in index.search("Shen Zhen")] == ["101280601"]
+
+
+def test_search_by_province(index) -> None:
+    assert {location.id for location in index.search("北京市")} == {"101010100", "101010200"}
+    assert [location.id for location in index.search("广东")] == ["101280601"]
+
+
+def test_nearest(index) -> None:
+    (location, distance), *_ = index.nearest(39.95, 116.32, 2)
+    assert location.id == "101010200"
+    assert distance < 5
+
+
+def test_missing_index(tmp_path: Path) -> None:
+    assert load_location_index(tmp_path / "missing.bin") is None
@@ -0,0 +1,60 @@
+"""分钟级降水的环形缓冲区"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.qweather.model import (  # noqa: E402
+    MINUTELY_SLOTS, MINUTELY_STEP, QWeatherMinutely)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def minutely(first: int, precips: list[float]) -> dict:
+    return {
+        "summary": f"from {first}",
+        "minutely": [
+            {
+                "fxTime": (START + timedelta(minutes=5 * (first + i))).isoformat(),
+                "precip": str(precip),
+                "type": "rain",
+            }
+            for i, precip in enumerate(precips)
+        ],
+    }
+
+
+def test_minutely_merge_after_shift() -> None:
+    nowcast = QWeatherMinutely(minutely(0, [0.0] * 24))
+    assert nowcast.appended == 24
+
+    # 30 分钟后的响应：重叠 18 个时间点，其中一个有变化，新增 6 个
+    precips = [0.0] * 24
+    precips[3] = 0.5
+    precips[20] = 1.2
+    assert nowcast.merge(minutely(6, precips)) == 7
+    assert (nowcast.appended, nowcast.updated) == (30, 1)
+    assert nowcast.summary == "from 6"
+
+    now = START + timedelta(minutes=30)
+    window = list(nowcast.window(now, 120))
+    assert [timestamp for timestamp, _, _ in window] == [
+        (now + timedelta(minutes=5 * i)).timestamp() for i in range(24)]
+    assert [precip for _, precip, _ in window] == precips
+    assert nowcast.total(now, 60) == pytest.approx(0.5)
+    assert nowcast.total(now, 120) == pytest.approx(1.7)
+    assert nowcast.next_precipitation(now) == (now + timedelta(minutes=15), "rain")
+
+    # 较早的时间点仍在缓冲区中
+    assert len(list(nowcast.window(START, 30))) == 6
+
+
+def test_minutely_ring_wraps() -> None:
+    nowcast = QWeatherMinutely(minutely(0, [1.0] * 6))
+    # 一整圈之后写入相同的槽，旧的时间点不再可见
+    nowcast.merge(minutely(MINUTELY_SLOTS, [2.0] * 6))
+    assert list(nowcast.window(START, 30)) == []
+    later = START + timedelta(seconds=MINUTELY_SLOTS * MINUTELY_STEP)
+    assert nowcast.total(later, 30) == pytest.approx(12.0)
+    assert nowcast.total(START + timedelta(hours=1), 30) is None